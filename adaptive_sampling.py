@@ -0,0 +1,94 @@
+import math
+
+# =================配置区域=================
+CI_WIDTH = 0.01  # 所有类别语调比率的 95% 置信区间宽度都小于这个值时停止读取
+MIN_PAGES = 5  # 至少读取的页数 (页数太少时方差估计不可靠)
+MIN_WORDS = 100  # 至少读取的词数 (与 extract_tone 的有效文档门槛一致)
+ORDER = 'stratified'  # 读页顺序：'sequential' 从头往后读；'stratified' 先读均匀分布在整个章节的页，再逐步加密
+Z_SCORE = 1.96  # 95% 置信水平
+
+
+# =========================================
+# 自适应抽页：把一份年报的目标章节看作由页面组成的有限总体，每页是一个整群，
+# 语调比率 R = Σ情感词数 / Σ总词数 是比率估计量。读了 m 页 (共 M 页) 后，
+#   s² = Σ(y_i - R·x_i)² / (m - 1)
+#   Var(R) ≈ (1 - m/M) · s² / (m · x̄²)
+# 置信区间宽度 2·z·√Var(R) 对所有类别都小于 CI_WIDTH 时停止。读完全部页面时有限总体校正项为 0，
+# 宽度自然为 0，因此最坏情况就是读完整个章节，与不抽样的结果一致 (跨页分词除外)。
+
+def page_order(n_pages, order=ORDER):
+    """
+    返回读页顺序 (0 .. n_pages-1 的一个排列)。
+    'stratified' 使用以 2 为底的 van der Corput 序列：前几页就覆盖章节的首、中、尾，之后逐步加密，
+    避免从头顺序读时只看到章节开头 (通常是偏正面的经营回顾) 就提前停止
+    """
+    if n_pages <= 0 or order != 'stratified':
+        return list(range(max(n_pages, 0)))
+    size = 1
+    while size < n_pages:
+        size *= 2
+    seen, result = set(), []
+    for i in range(size):
+        # i 的二进制位反转得到 [0, 1) 内的分数
+        reversed_bits, x, denominator = 0, i, 1
+        while x:
+            reversed_bits = reversed_bits * 2 + (x & 1)
+            x >>= 1
+            denominator *= 2
+        index = int(reversed_bits / denominator * n_pages) if i else 0
+        if index not in seen:
+            seen.add(index)
+            result.append(index)
+    result.extend(i for i in range(n_pages) if i not in seen)
+    return result
+
+
+def ratio_halfwidth(numerators, denominators, total_units, z=Z_SCORE):
+    """
+    整群抽样下比率估计量的置信区间半宽；numerators / denominators 为已读各页的 (情感词数, 总词数)
+    """
+    m = len(denominators)
+    if total_units and m >= total_units:
+        return 0.0  # 已读完全部页面，没有抽样误差
+    x_sum = sum(denominators)
+    if m < 2 or x_sum == 0:
+        return float('inf')
+    ratio = sum(numerators) / x_sum
+    x_mean = x_sum / m
+    s2 = sum((y - ratio * x) ** 2 for y, x in zip(numerators, denominators)) / (m - 1)
+    fpc = 1 - m / total_units if total_units else 1.0
+    return z * math.sqrt(fpc * s2 / m) / x_mean
+
+
+def sample_pages(read_page, count_page, n_pages, names,
+                 ci_width=CI_WIDTH, min_pages=MIN_PAGES, min_words=MIN_WORDS, order=ORDER):
+    """
+    按 order 逐页读取并计数，置信区间足够窄时提前停止。
+    read_page(i) 返回第 i 页 (章节内从 0 开始) 的文本，count_page(text) 返回 (各类别计数列表, 总词数)。
+    返回 {'counts': 各类别总计数, 'words': 总词数, 'pages_read', 'pages_total', 'halfwidths': 各类别置信区间半宽}
+    """
+    per_page = [[] for _ in names]
+    words = []
+    halfwidths = [float('inf')] * len(names)
+
+    for i in page_order(n_pages, order):
+        counts, n = count_page(read_page(i))
+        for k, count in enumerate(counts):
+            per_page[k].append(count)
+        words.append(n)
+
+        if len(words) >= min_pages and sum(words) >= min_words:
+            halfwidths = [ratio_halfwidth(ys, words, n_pages) for ys in per_page]
+            if max(halfwidths) * 2 <= ci_width:
+                break
+    else:
+        if words:
+            halfwidths = [ratio_halfwidth(ys, words, n_pages) for ys in per_page]
+
+    return {
+        'counts': [sum(ys) for ys in per_page],
+        'words': sum(words),
+        'pages_read': len(words),
+        'pages_total': n_pages,
+        'halfwidths': halfwidths,
+    }
@@ -0,0 +1,70 @@
+import time
+import tempfile
+import multiprocessing as mp
+
+import pandas as pd
+
+# =================配置区域=================
+REPEAT = 3  # 每种方式启动几个全新进程，取中位数
+SAMPLE_TEXT = '报告期内公司营业收入同比增长，但原材料价格波动带来的不确定性或将影响未来盈利能力。'
+OUTPUT_FILE = 'jieba_startup_benchmark.csv'
+
+
+# =========================================
+# 在全新的子进程中测量 "初始化 + 第一次分词" 的耗时 (不含 import)，即进程池中每个子进程的启动开销：
+#   default_cold   jieba 默认词典，没有缓存 (首次运行或临时目录被清理)
+#   default_cache  jieba 默认词典，使用临时目录中的缓存
+#   finance_cache  jieba_setup 合并后的金融词典，使用 jieba_dict/ 中的缓存
+#   fork_inherit   主进程初始化后 fork 出的子进程 (extract_tone 在 Linux 上的实际情况)
+
+def start_default(use_cache):
+    import jieba
+    import logging
+    jieba.setLogLevel(logging.WARNING)
+    if not use_cache:
+        jieba.dt.tmp_dir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    jieba.lcut(SAMPLE_TEXT)
+    return time.perf_counter() - start
+
+
+def start_finance():
+    import jieba
+    import extract_tone
+    start = time.perf_counter()
+    extract_tone.init_jieba()
+    jieba.lcut(SAMPLE_TEXT)
+    return time.perf_counter() - start
+
+
+def measure(ctx, func, *args):
+    times = []
+    for _ in range(REPEAT):
+        with ctx.Pool(1) as pool:
+            times.append(pool.apply(func, args))
+    return sorted(times)[len(times) // 2]
+
+
+if __name__ == "__main__":
+    import jieba
+    import extract_tone
+
+    # 先确保金融词典和默认词典的缓存都已生成，再测 "缓存命中" 的情况
+    seconds, status = extract_tone.init_jieba()
+    print(f"金融词典: {seconds:.2f} 秒 ({status})，签名 {extract_tone.jieba_setup.dictionary_signature()}")
+    jieba.Tokenizer().initialize()
+
+    spawn = mp.get_context('spawn')
+    rows = [
+        {'Mode': 'default_cold', 'Seconds': measure(spawn, start_default, False)},
+        {'Mode': 'default_cache', 'Seconds': measure(spawn, start_default, True)},
+        {'Mode': 'finance_cache', 'Seconds': measure(spawn, start_finance)},
+    ]
+    if 'fork' in mp.get_all_start_methods():
+        rows.append({'Mode': 'fork_inherit', 'Seconds': measure(mp.get_context('fork'), start_finance)})
+
+    df = pd.DataFrame(rows)
+    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    print("\n" + "=" * 20 + " jieba 进程启动耗时 (中位数) " + "=" * 20)
+    print(df.to_string(index=False))
+    print(f"\n结果已保存为: {OUTPUT_FILE}")
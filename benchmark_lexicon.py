@@ -0,0 +1,91 @@
+import os
+import time
+import random
+
+import jieba
+
+import extract_tone
+from lexicon import CompiledLexicon
+
+# =================配置区域=================
+PDF_DIR = extract_tone.PDF_DIR
+SAMPLE_FILES = 20  # 用于取真实分词结果的 PDF 数 (优先读 text_cache)；没有 PDF 时改用合成语料
+SYNTHETIC_TOKENS = 2_000_000  # 合成语料的词数
+LARGE_LEXICON_TERMS = 5000  # 大词典规模测试：词条总数
+LARGE_LEXICON_CATEGORIES = 8  # 大词典规模测试：类别数
+REPEAT = 3  # 每种方法重复次数，取最快一次
+RANDOM_SEED = 42
+
+
+# =========================================
+
+def legacy_count(words, categories):
+    """
+    原来的做法：先物化为列表，再对每个类别各扫描一遍
+    """
+    words = list(words)
+    return [sum(1 for w in words if w in terms) for terms in categories.values()], len(words)
+
+
+def load_corpus():
+    """
+    取样本文档的分词结果拼成一个大词序列
+    """
+    rng = random.Random(RANDOM_SEED)
+    tokens = []
+    if os.path.isdir(PDF_DIR):
+        files = sorted(f for f in os.listdir(PDF_DIR) if f.endswith('.pdf'))
+        rng.shuffle(files)
+        for filename in files[:SAMPLE_FILES]:
+            path = os.path.join(PDF_DIR, filename)
+            try:
+                words, _ = extract_tone.tokenize_pdf(path, extract_tone.hash_file(path))
+                tokens.extend(words)
+            except Exception as e:
+                print(f"  [读取失败] {filename}: {e}")
+    if not tokens:
+        print("没有可用的 PDF，改用 jieba 词典合成语料")
+        vocab = list(jieba.dt.FREQ)
+        tokens = rng.choices(vocab, k=SYNTHETIC_TOKENS)
+    return tokens
+
+
+def timed(func):
+    best, result = None, None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def compare(title, tokens, categories):
+    print(f"\n--- {title}：{sum(len(t) for t in categories.values())} 个词条，{len(categories)} 个类别 ---")
+    t_legacy, (legacy, total) = timed(lambda: legacy_count(iter(tokens), categories))
+    exact = CompiledLexicon(categories)
+    t_exact, (counts_exact, _) = timed(lambda: exact.count(iter(tokens)))
+    phrase = CompiledLexicon(categories, tokenize=jieba.lcut)
+    t_phrase, (counts_phrase, _) = timed(lambda: phrase.count(iter(tokens)))
+
+    per_million = 1_000_000 / total
+    print(f"{'方法':<20}{'秒/百万词':>12}{'加速比':>10}  计数")
+    print(f"{'原始 (多次扫描)':<20}{t_legacy * per_million:>12.4f}{1:>10.2f}  {legacy}")
+    print(f"{'编译词典 (整词)':<20}{t_exact * per_million:>12.4f}{t_legacy / t_exact:>10.2f}  {counts_exact}")
+    print(f"{'编译词典 (含短语)':<20}{t_phrase * per_million:>12.4f}{t_legacy / t_phrase:>10.2f}  {counts_phrase}")
+    print("整词模式计数与原始方法一致" if counts_exact == legacy else "警告：整词模式计数与原始方法不一致！")
+
+
+if __name__ == "__main__":
+    extract_tone.init_jieba()
+    tokens = load_corpus()
+    print(f"语料: {len(tokens)} 个词")
+
+    compare("内置词典", tokens, extract_tone.LEXICON)
+
+    # 规模测试：从语料中随机抽词条组成大词典，观察类别数增加时的开销
+    rng = random.Random(RANDOM_SEED)
+    vocab = sorted(set(tokens))
+    terms = rng.sample(vocab, min(LARGE_LEXICON_TERMS, len(vocab)))
+    large = {f'Cat{i}': set(terms[i::LARGE_LEXICON_CATEGORIES]) for i in range(LARGE_LEXICON_CATEGORIES)}
+    compare("大词典", tokens, large)
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import random
+import multiprocessing as mp
+
+import pandas as pd
+
+import extract_tone
+from pdf_backends import BACKENDS, open_pdf, require_backend
+
+# =================配置区域=================
+PDF_DIR = extract_tone.PDF_DIR  # 样本 PDF 所在文件夹
+SAMPLE_SIZE = 50  # 随机抽取的样本文件数 (None 表示全部)
+RANDOM_SEED = 42
+BACKENDS_TO_TEST = ['pdfplumber', 'pypdfium2', 'pdfminer']
+REFERENCE_BACKEND = 'pdfplumber'  # 以它的语调结果为基准计算差异，并用它定位每份文件要读取的页面范围
+TOLERANCE = 0.001  # 语调比率的绝对差容忍度
+OUTPUT_FILE = 'backend_benchmark.csv'
+
+
+# =========================================
+
+def peak_rss_mb():
+    """
+    当前进程的峰值内存 (MB)；Linux 的 ru_maxrss 单位是 KB，macOS 是字节
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except Exception:
+            return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+def pin_sections(file_paths, backend):
+    """
+    用同一个后端为每份文件定位一次页面范围 (按 extract_tone.PAGE_STRATEGY)，返回 {路径: 页面范围}。
+    各后端之后都读取这些页面，计时和语调差异才是在相同的页上比较的；定位失败的文件不参与对比
+    """
+    sections = {}
+    for path in file_paths:
+        try:
+            pdf = open_pdf(path, backend)
+        except Exception:
+            continue
+        try:
+            sections[path] = extract_tone.select_pages(pdf, extract_tone.PAGE_STRATEGY)
+        except Exception:
+            pass
+        finally:
+            pdf.close()
+    return sections
+
+
+def run_backend(backend, sections):
+    """
+    在独立的子进程中跑一个后端：按 sections 给定的页面范围提取文本，只对提取计时并记录峰值内存，之后再分词计算语调。
+    依赖缺失时在循环之前抛出 ImportError，由主进程跳过该后端，不会记成每个文件各失败一次
+    """
+    require_backend(backend)
+    page_texts = {}
+    errors = 0
+    start = time.perf_counter()
+    for path, section in sections.items():
+        try:
+            page_texts[path], _ = extract_tone.extract_pages(path, backend, section=section)
+        except Exception:
+            errors += 1
+    elapsed = time.perf_counter() - start
+    rss = peak_rss_mb()
+
+    extract_tone.init_jieba()
+    tones = {}
+    for path, pages in page_texts.items():
+        tones[path] = extract_tone.score_tokens(extract_tone.iter_tokens(pages))
+
+    return {
+        'Backend': backend,
+        'Files': len(page_texts),
+        'Pages': sum(len(pages) for pages in page_texts.values()),
+        'Errors': errors,
+        'Seconds': elapsed,
+        'Peak_RSS_MB': rss,
+    }, tones
+
+
+def compare_tones(tones, reference):
+    """
+    与基准后端逐文件比较 Positive_Tone / Negative_Tone 的绝对差
+    """
+    diffs = {'Positive_Tone': [], 'Negative_Tone': []}
+    for path, ref in reference.items():
+        tone = tones.get(path)
+        if not ref or not tone:
+            continue
+        for col in diffs:
+            diffs[col].append(abs(tone[col] - ref[col]))
+
+    stats = {}
+    for col, values in diffs.items():
+        short = 'Pos' if col == 'Positive_Tone' else 'Neg'
+        stats[f'{short}_MeanAbsDiff'] = sum(values) / len(values) if values else None
+        stats[f'{short}_MaxAbsDiff'] = max(values) if values else None
+    pairs = list(zip(diffs['Positive_Tone'], diffs['Negative_Tone']))
+    stats['Within_Tolerance'] = (
+        sum(1 for p, n in pairs if p <= TOLERANCE and n <= TOLERANCE) / len(pairs) if pairs else None
+    )
+    return stats
+
+
+def _available(backend):
+    try:
+        require_backend(backend)
+        return True
+    except ImportError:
+        return False
+
+
+if __name__ == "__main__":
+    files = sorted(f for f in os.listdir(PDF_DIR) if f.endswith('.pdf'))
+    if SAMPLE_SIZE and len(files) > SAMPLE_SIZE:
+        random.Random(RANDOM_SEED).shuffle(files)
+        files = sorted(files[:SAMPLE_SIZE])
+    file_paths = [os.path.join(PDF_DIR, f) for f in files]
+    print(f"样本: {len(file_paths)} 份 PDF，对比后端: {', '.join(BACKENDS_TO_TEST)}")
+
+    # 页面范围在计时之前统一定位：各后端自行定位时，书签 / 目录解析的差异会让它们读取不同的页
+    locator = next((b for b in [REFERENCE_BACKEND] + BACKENDS_TO_TEST
+                    if b in BACKENDS and _available(b)), None)
+    if locator is None:
+        print("没有可用的后端。")
+        sys.exit(1)
+    sections = pin_sections(file_paths, locator)
+    print(f"页面范围由 {locator} 定位: {len(sections)} 份文件，共 "
+          f"{sum(s['end'] - s['start'] for s in sections.values())} 页")
+
+    # 每个后端用全新的 spawn 子进程运行，峰值内存互不污染
+    ctx = mp.get_context('spawn')
+    rows = []
+    all_tones = {}
+    for backend in BACKENDS_TO_TEST:
+        if backend not in BACKENDS:
+            print(f"跳过未知后端: {backend}")
+            continue
+        print(f"正在测试 {backend} ...")
+        try:
+            with ctx.Pool(1) as pool:
+                row, tones = pool.apply(run_backend, (backend, sections))
+        except ImportError as e:
+            print(f"  [跳过] 缺少依赖: {e}")
+            continue
+        row['Pages_per_sec'] = row['Pages'] / row['Seconds'] if row['Seconds'] else None
+        rows.append(row)
+        all_tones[backend] = tones
+
+    if not rows:
+        print("没有可用的后端。")
+        sys.exit(1)
+
+    reference = all_tones.get(REFERENCE_BACKEND)
+    if reference is not None:
+        for row in rows:
+            row.update(compare_tones(all_tones[row['Backend']], reference))
+
+    df = pd.DataFrame(rows)
+    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    print("\n" + "=" * 20 + " PDF 后端对比 " + "=" * 20)
+    print(df.to_string(index=False))
+    print(f"\n结果已保存为: {OUTPUT_FILE}")
+    print(f"语调差异以 {REFERENCE_BACKEND} 为基准，Within_Tolerance 为两项差异均不超过 {TOLERANCE} 的文件占比。")
@@ -0,0 +1,123 @@
+import sqlite3
+import json
+import time
+from datetime import datetime
+
+# =================配置区域=================
+STATE_DB = 'crawl_state.sqlite'  # 默认的爬取状态库文件
+
+
+# =========================================
+
+class CrawlState:
+    """
+    本地爬取状态库 (SQLite)：
+    1. announcements 表按 (股票代码, 年份, announcementId) 保存抓到的每条公告原文；
+    2. checkpoints 表记录每个抓取范围已完整抓到的最新公告时间 (断点)。
+    后续运行只需从断点日期开始查询，历史公告直接从本地读取。
+    """
+
+    def __init__(self, db_path=STATE_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS announcements (
+                stock_code TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                announcement_id TEXT NOT NULL,
+                announcement_time INTEGER,
+                raw_json TEXT NOT NULL,
+                PRIMARY KEY (stock_code, year, announcement_id)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                scope TEXT PRIMARY KEY,
+                last_time INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get_checkpoint(self, scope):
+        """
+        返回该范围已完整抓取到的最新公告时间 (毫秒时间戳)，没有断点时返回 None
+        """
+        row = self.conn.execute(
+            "SELECT last_time FROM checkpoints WHERE scope = ?", (scope,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, scope, last_time):
+        """
+        推进断点；只允许向后推进，避免一次不完整的抓取把断点倒退
+        """
+        current = self.get_checkpoint(scope)
+        if current is not None and current >= last_time:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (scope, last_time, updated_at) VALUES (?, ?, ?)",
+            (scope, int(last_time), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        self.conn.commit()
+
+    def start_date(self, scope, default):
+        """
+        增量查询的起始日期：有断点时从断点当天开始 (当天的公告会被主键去重)，否则用 default
+        """
+        checkpoint = self.get_checkpoint(scope)
+        if checkpoint is None:
+            return default
+        checkpoint_date = time.strftime("%Y-%m-%d", time.localtime(checkpoint / 1000))
+        return max(checkpoint_date, default)
+
+    def save_announcements(self, items, stock_code=None, year=None):
+        """
+        批量写入公告，已存在的 (股票代码, 年份, announcementId) 会被忽略。
+        stock_code / year 不传时分别取公告的 secCode 和发布时间所在年份。
+        返回新增的条数。
+        """
+        rows = []
+        for item in items:
+            ann_time = item.get('announcementTime')
+            rows.append((
+                stock_code or item.get('secCode') or '',
+                year or int(time.strftime("%Y", time.localtime(ann_time / 1000))),
+                str(item.get('announcementId') or item.get('adjunctUrl')),
+                ann_time,
+                json.dumps(item, ensure_ascii=False)
+            ))
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO announcements "
+            "(stock_code, year, announcement_id, announcement_time, raw_json) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def load_announcements(self, stock_code=None, year=None):
+        """
+        读取本地保存的公告原文 (按发布时间倒序，与接口返回顺序一致)
+        """
+        sql = "SELECT raw_json FROM announcements WHERE 1 = 1"
+        params = []
+        if stock_code is not None:
+            sql += " AND stock_code = ?"
+            params.append(stock_code)
+        if year is not None:
+            sql += " AND year = ?"
+            params.append(year)
+        sql += " ORDER BY announcement_time DESC, announcement_id"
+        return [json.loads(row[0]) for row in self.conn.execute(sql, params)]
+
+    def close(self):
+        self.conn.close()
+
+
+def latest_time(items):
+    """
+    一批公告里最新的发布时间 (毫秒时间戳)，空列表返回 None
+    """
+    times = [item['announcementTime'] for item in items if item.get('announcementTime')]
+    return max(times) if times else None
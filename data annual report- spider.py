@@ -1,7 +1,15 @@
-import requests
 import pandas as pd
 import time
 import random
+import asyncio
+
+import http_client
+from crawl_state import CrawlState, latest_time
+
+try:
+    import aiohttp  # 异步模式需要: pip install aiohttp
+except ImportError:
+    aiohttp = None
 
 # =================配置区域=================
 START_DATE = '2015-01-01'
@@ -9,6 +17,17 @@ END_DATE = '2024-04-30'
 OUTPUT_FILE = 'annual_report_links_full.csv'
 TARGET_COUNT = 1500
 
+# 爬取模式：'sync' 为原来的逐只串行爬取；'async' 为异步并发爬取 (需要 aiohttp，未安装时自动退回 'sync')
+CRAWL_MODE = 'async'
+MAX_CONCURRENCY = 8  # 同时在途的请求数上限
+RATE_LIMIT = 3.0  # 全局令牌桶：平均每秒最多发出的请求数（礼貌预算）
+RATE_BURST = 3  # 令牌桶容量，即允许的瞬时突发请求数
+
+# 增量爬取：开启后每只股票只查询上次断点之后的新公告，历史公告从本地状态库读取
+INCREMENTAL = True
+STATE_DB = 'crawl_state_links.sqlite'
+PAGE_SIZE = 30
+
 # 手动内置200个常用股票代码，这能产生约1800条数据，足够满足SCI样本量要求
 # 包含：万科、格力、茅台、伊利、招商、平安等各行业龙头及随机样本
 FIXED_STOCK_LIST = [
@@ -35,21 +54,23 @@ FIXED_STOCK_LIST = [
 ]
 
 
+QUERY_URL = 'http://www.cninfo.com.cn/new/hisAnnouncement/query'
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+    'X-Requested-With': 'XMLHttpRequest'
+}
+
+
 # =========================================
 
-def get_pdf_links(stock_code):
+def build_query_data(stock_code, page_num=1, start_date=START_DATE):
     """
-    向巨潮资讯网发送请求 (逻辑不变)
+    构造巨潮资讯网公告查询的表单参数
     """
-    url = 'http://www.cninfo.com.cn/new/hisAnnouncement/query'
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-        'X-Requested-With': 'XMLHttpRequest'
-    }
-    data = {
-        'pageNum': 1,
-        'pageSize': 30,
+    return {
+        'pageNum': page_num,
+        'pageSize': PAGE_SIZE,
         'column': 'szse',
         'tabName': 'fulltext',
         'plate': '',
@@ -58,50 +79,224 @@ def get_pdf_links(stock_code):
         'secid': '',
         'category': 'category_ndbg_szsh',
         'trade': '',
-        'seDate': f'{START_DATE}~{END_DATE}',
+        'seDate': f'{start_date}~{END_DATE}',
         'sortName': '',
         'sortType': '',
         'isHLtitle': 'true'
     }
 
+
+def parse_announcements(stock_code, json_data):
+    """
+    从接口返回的 JSON 中筛选年报正文链接（同步 / 异步两种模式共用同一套过滤规则）
+    """
     results = []
+    if json_data.get('announcements'):
+        for item in json_data['announcements']:
+            title = item['announcementTitle']
+            if '摘要' in title or '英文' in title or '取消' in title or '修订' in title:
+                continue
+            if '年度报告' not in title:
+                continue
+
+            pdf_url = "http://static.cninfo.com.cn/" + item['adjunctUrl']
+            publish_time = time.strftime("%Y-%m-%d", time.localtime(item['announcementTime'] / 1000))
+
+            results.append({
+                'StockCode': stock_code,
+                'Title': title,
+                'PublishDate': publish_time,
+                'PDF_Link': pdf_url
+            })
+    return results
+
+
+def query_start_date(stock_code, state):
+    """
+    增量模式下从该股票的断点日期开始查询，否则从 START_DATE 开始
+    """
+    if state is None:
+        return START_DATE
+    return state.start_date(stock_code, START_DATE)
+
+
+def finish_stock(stock_code, items, complete, state):
+    """
+    保存本次抓到的公告；只有完整翻到末页时才推进断点，
+    返回该股票在本地状态库中的全部年报链接（历史 + 本次新增）
+    """
+    if state is None:
+        return parse_announcements(stock_code, {'announcements': items})
+
+    state.save_announcements(items, stock_code=stock_code)
+    if complete and latest_time(items):
+        state.set_checkpoint(stock_code, latest_time(items))
+    return parse_announcements(stock_code, {'announcements': state.load_announcements(stock_code=stock_code)})
+
+
+def get_pdf_links(stock_code, state=None):
+    """
+    向巨潮资讯网发送请求，沿 hasMore 一直翻到最后一页
+    """
+    start_date = query_start_date(stock_code, state)
+    items = []
+    complete = False
+    page_num = 1
     try:
-        response = requests.post(url, headers=headers, data=data, timeout=10)
-        if response.status_code == 200:
+        while True:
+            # 共享客户端：长连接复用 + 5xx/超时自动退避重试 + 全局熔断
+            response = http_client.post(QUERY_URL, headers=HEADERS,
+                                        data=build_query_data(stock_code, page_num, start_date), timeout=10)
+            if response.status_code != 200:
+                print(f"代码 {stock_code} 第 {page_num} 页请求失败，状态码: {response.status_code}")
+                break
             json_data = response.json()
-            if json_data['announcements']:
-                for item in json_data['announcements']:
-                    title = item['announcementTitle']
-                    if '摘要' in title or '英文' in title or '取消' in title or '修订' in title:
-                        continue
-                    if '年度报告' not in title:
-                        continue
-
-                    pdf_url = "http://static.cninfo.com.cn/" + item['adjunctUrl']
-                    publish_time = time.strftime("%Y-%m-%d", time.localtime(item['announcementTime'] / 1000))
-
-                    results.append({
-                        'StockCode': stock_code,
-                        'Title': title,
-                        'PublishDate': publish_time,
-                        'PDF_Link': pdf_url
-                    })
+            items.extend(json_data.get('announcements') or [])
+            if not json_data.get('hasMore'):
+                complete = True
+                break
+            page_num += 1
+            time.sleep(random.uniform(0.5, 1.5))
     except Exception as e:
         print(f"代码 {stock_code} 发生错误: {e}")
 
-    return results
+    return finish_stock(stock_code, items, complete, state)
 
 
-# =================主程序=================
-if __name__ == "__main__":
+# =================异步并发模式=================
+class TokenBucket:
+    """
+    全局令牌桶限速器：所有协程共享同一个桶，
+    保证无论并发多少，整体请求速率都不超过 rate 次/秒
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # 持锁等待，保证排队的协程按先后顺序拿到令牌
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def fetch_page_async(session, data, limiter, semaphore):
+    """
+    异步请求一页公告：先受并发上限约束，再从令牌桶取令牌后发请求；
+    5xx / 限流 / 超时按 http_client 的退避策略重试，并与同步请求共用同一个熔断器
+    """
+    breaker = http_client.BREAKER
+    for attempt in range(http_client.MAX_RETRIES + 1):
+        await breaker.wait_async()
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                async with session.post(QUERY_URL, data=data) as response:
+                    status = response.status
+                    error = f"状态码 {status}"
+                    if not http_client.is_retryable_status(status):
+                        breaker.record_success()
+                        if status != 200:
+                            raise RuntimeError(error)
+                        # 巨潮接口的 Content-Type 不一定是 application/json，这里不做校验
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = None
+                error = repr(e)
+
+        breaker.record_failure(throttled=status in http_client.THROTTLE_STATUS)
+        if attempt == http_client.MAX_RETRIES:
+            raise RuntimeError(f"重试 {attempt} 次后仍失败: {error}")
+        await asyncio.sleep(http_client.backoff_delay(attempt))
+
+
+async def get_pdf_links_async(session, stock_code, limiter, semaphore, state=None):
+    """
+    get_pdf_links 的异步版本：同样沿 hasMore 翻页，每一页都单独计入并发与限速
+    """
+    start_date = query_start_date(stock_code, state)
+    items = []
+    complete = False
+    page_num = 1
+    try:
+        while True:
+            json_data = await fetch_page_async(
+                session, build_query_data(stock_code, page_num, start_date), limiter, semaphore)
+            items.extend(json_data.get('announcements') or [])
+            if not json_data.get('hasMore'):
+                complete = True
+                break
+            page_num += 1
+    except Exception as e:
+        print(f"代码 {stock_code} 第 {page_num} 页发生错误: {e}")
+
+    return finish_stock(stock_code, items, complete, state)
+
+
+async def crawl_async(stock_list, state=None):
+    """
+    异步并发爬取全部股票，吞吐量由令牌桶（礼貌预算）决定，而不是单次往返延迟
+    """
+    limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=10)
+
+    links_by_code = {}
+    found_count = 0
+
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        tasks = {
+            asyncio.create_task(get_pdf_links_async(session, code, limiter, semaphore, state)): code
+            for code in stock_list
+        }
+        pending = set(tasks)
+        done_count = 0
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                done_count += 1
+                code = tasks[task]
+                links = task.result()
+                links_by_code[code] = links
+                found_count += len(links)
+                status = f"找到 {len(links)} 份年报" if links else "未找到"
+                print(f"[{done_count}/{len(stock_list)}] {code} -> {status}")
+
+            # 检查是否达到目标
+            if found_count >= TARGET_COUNT and pending:
+                print(f"\n已达到目标数量 {TARGET_COUNT} 条，取消剩余 {len(pending)} 个请求。")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                break
+
+    # 按股票列表原顺序拼接，保证输出顺序与串行模式一致
     all_data = []
+    for code in stock_list:
+        all_data.extend(links_by_code.get(code, []))
+    return all_data
 
-    print(f"开始爬取 {len(FIXED_STOCK_LIST)} 只股票的年报链接...")
 
-    for index, code in enumerate(FIXED_STOCK_LIST):
-        print(f"[{index + 1}/{len(FIXED_STOCK_LIST)}] 正在处理: {code}")
+def crawl_sync(stock_list, state=None):
+    """
+    原始的串行爬取逻辑
+    """
+    all_data = []
+    for index, code in enumerate(stock_list):
+        print(f"[{index + 1}/{len(stock_list)}] 正在处理: {code}")
 
-        links = get_pdf_links(code)
+        links = get_pdf_links(code, state)
         if links:
             all_data.extend(links)
             print(f"  -> 找到 {len(links)} 份年报")
@@ -115,6 +310,27 @@ if __name__ == "__main__":
 
         # 稍微延时，防止过快
         time.sleep(random.uniform(0.5, 1.5))
+    return all_data
+
+
+# =================主程序=================
+if __name__ == "__main__":
+    print(f"开始爬取 {len(FIXED_STOCK_LIST)} 只股票的年报链接...")
+
+    state = CrawlState(STATE_DB) if INCREMENTAL else None
+    if state is not None:
+        print(f"增量模式：断点与历史公告保存在 {STATE_DB}")
+
+    if CRAWL_MODE == 'async' and aiohttp is None:
+        print("提示：未安装 aiohttp (pip install aiohttp)，改用同步模式逐只爬取。")
+    if CRAWL_MODE == 'async' and aiohttp is not None:
+        print(f"异步模式：并发上限 {MAX_CONCURRENCY}，限速 {RATE_LIMIT} 次/秒")
+        all_data = asyncio.run(crawl_async(FIXED_STOCK_LIST, state))
+    else:
+        all_data = crawl_sync(FIXED_STOCK_LIST, state)
+
+    if state is not None:
+        state.close()
 
     if all_data:
         df = pd.DataFrame(all_data)
@@ -125,4 +341,4 @@ if __name__ == "__main__":
         print(f"文件已保存为: {OUTPUT_FILE}")
         print(f"========================================")
     else:
-        print("未获取到数据，请检查网络连接。")
\ No newline at end of file
+        print("未获取到数据，请检查网络连接。")
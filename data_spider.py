@@ -20,6 +20,14 @@ import pandas as pd
 import json
 import time
 
+import http_client
+from crawl_state import CrawlState, latest_time
+
+# 增量爬取：断点与已抓到的公告保存在本地 SQLite，后续运行只抓断点之后的新公告
+STATE_DB = 'crawl_state_ndbg.sqlite'
+# 每年最多保留的公告条数；None 表示沿 hasMore 抓到最后一页 (设为 600 即恢复原先的抽样口径)
+MAX_PER_YEAR = None
+
 def get_announcements(page_num, keyword, start_date, end_date):
     """
     获取指定页码的公告数据。
@@ -44,7 +52,8 @@ def get_announcements(page_num, keyword, start_date, end_date):
         "isHLtitle": "true"
     }
     try:
-        response = requests.post(url, headers=headers, data=data)
+        # 共享客户端：长连接复用、默认超时、5xx/超时自动退避重试
+        response = http_client.post(url, headers=headers, data=data)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -60,40 +69,53 @@ def main():
     """
     keyword = "年度报告"
     all_reports = []
+    state = CrawlState(STATE_DB)
     
     for year in range(2015, 2024):
-        start_date = f"{year}-01-01"
+        scope = f"{keyword}:{year}"
+        # 有断点时只从断点当天开始查询
+        start_date = state.start_date(scope, f"{year}-01-01")
         end_date = f"{year}-12-31"
-        yearly_announcements = []
+        fetched = []
+        complete = False
         
-        print(f"======== 开始爬取 {year} 年的数据 ========")
-        # 每年最多爬取 600 条，即 20 页
-        for page_num in range(1, 21):
+        print(f"======== 开始爬取 {year} 年的数据 (自 {start_date} 起) ========")
+        page_num = 1
+        while True:
             print(f"正在爬取 {year} 年第 {page_num} 页...")
             result = get_announcements(page_num, keyword, start_date, end_date)
             
-            if result and result.get('announcements'):
-                announcements = result['announcements']
-                # 过滤标题，只保留完全匹配“年度报告”的项
-                filtered_announcements = [
-                    ann for ann in announcements if '年度报告' in ann.get('announcementTitle', '')
-                ]
-                yearly_announcements.extend(filtered_announcements)
-                
-                # 如果当年已获取足够数据或已无更多数据，则停止
-                if len(yearly_announcements) >= 600 or not result.get('hasMore'):
-                    if not result.get('hasMore'):
-                        print(f"{year} 年已到达最后一页。")
-                    break
-                
-                time.sleep(1)
-            else:
-                print(f"{year} 年未能获取到数据或已到达末尾。")
+            if result is None:
+                print(f"{year} 年第 {page_num} 页请求失败，本次不推进断点。")
                 break
+            
+            announcements = result.get('announcements') or []
+            # 过滤标题，只保留完全匹配“年度报告”的项
+            fetched.extend(
+                ann for ann in announcements if '年度报告' in ann.get('announcementTitle', '')
+            )
+            
+            # 沿 hasMore 一直翻到最后一页
+            if not result.get('hasMore'):
+                print(f"{year} 年已到达最后一页。")
+                complete = True
+                break
+            
+            page_num += 1
+            time.sleep(1)
         
-        # 截取前600条
-        all_reports.extend(yearly_announcements[:600])
-        print(f"======== {year} 年数据爬取完成，共获取 {len(yearly_announcements[:600])} 条 ========\n")
+        new_count = state.save_announcements(fetched, year=year)
+        if complete and latest_time(fetched):
+            state.set_checkpoint(scope, latest_time(fetched))
+        
+        # 本地状态库里保存着该年的全部公告 (历史 + 本次新增)
+        yearly_announcements = state.load_announcements(year=year)
+        if MAX_PER_YEAR:
+            yearly_announcements = yearly_announcements[:MAX_PER_YEAR]
+        all_reports.extend(yearly_announcements)
+        print(f"======== {year} 年数据爬取完成，新增 {new_count} 条，共 {len(yearly_announcements)} 条 ========\n")
+    
+    state.close()
 
     if all_reports:
         df = pd.DataFrame(all_reports)
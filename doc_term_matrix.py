@@ -0,0 +1,187 @@
+import os
+import json
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# =================配置区域=================
+DTM_DIR = 'dtm'  # 文档-词频矩阵的保存目录
+OUTPUT_FILE = 'dtm_tone_results.csv'  # 直接运行本脚本时，用矩阵重新计算内置词典语调的输出文件
+
+
+# =========================================
+# 文档 × 词表 的稀疏词频矩阵 (scipy CSR)：
+#   data.npy / indices.npy / indptr.npy  CSR 的三个数组，未压缩保存，可以 np.load(mmap_mode='r') 直接映射
+#   vocab.txt                            第 j 列对应的词 (每行一个)
+#   docs.csv                             文件索引：StockCode, Year, sha256, file_name, Row (矩阵行号)
+#   meta.json                            矩阵形状及生成时的提取器/分词器版本
+# 一行对应一份内容 (sha256)，字节相同的多个文件在 docs.csv 中指向同一行。
+# 有了矩阵，新的词典只需一次稀疏矩阵乘法即可得到所有文档的计数，不必重新解析 PDF 和分词。
+# 注意：矩阵只记录单个词的频数，被 jieba 切开的多词短语不会计入 (相当于 PHRASE_MATCHING = False)。
+
+def build_matrix(documents):
+    """
+    documents 为 [(sha256, 词迭代器)]，逐文档累加，返回 (CSR 矩阵, 词表列表)
+    """
+    vocab = {}
+    indptr = array('q', [0])
+    indices = array('i')
+    data = array('i')
+    for _, tokens in documents:
+        counts = Counter(tokens)
+        for word, n in counts.items():
+            j = vocab.get(word)
+            if j is None:
+                j = vocab[word] = len(vocab)
+            indices.append(j)
+            data.append(n)
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.frombuffer(data, dtype=np.int32), np.frombuffer(indices, dtype=np.int32),
+         np.frombuffer(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(vocab))
+    )
+    matrix.sort_indices()
+    return matrix, list(vocab)
+
+
+def save_matrix(directory, matrix, vocab, docs, meta=None):
+    """
+    保存矩阵、词表和文件索引；docs 为 DataFrame (StockCode, Year, sha256, file_name, Row)
+    """
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, 'data.npy'), matrix.data)
+    np.save(os.path.join(directory, 'indices.npy'), matrix.indices)
+    np.save(os.path.join(directory, 'indptr.npy'), matrix.indptr)
+    with open(os.path.join(directory, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab))
+    docs.to_csv(os.path.join(directory, 'docs.csv'), index=False, encoding='utf-8-sig')
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'shape': list(matrix.shape), **(meta or {})}, f, ensure_ascii=False, indent=2)
+
+
+class DocTermMatrix:
+    """
+    读取保存的词频矩阵，用稀疏矩阵乘法计算任意词典的语调
+    """
+
+    def __init__(self, directory=DTM_DIR, mmap=True):
+        mode = 'r' if mmap else None
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.matrix = sparse.csr_matrix(
+            (np.load(os.path.join(directory, 'data.npy'), mmap_mode=mode),
+             np.load(os.path.join(directory, 'indices.npy'), mmap_mode=mode),
+             np.load(os.path.join(directory, 'indptr.npy'), mmap_mode=mode)),
+            shape=tuple(self.meta['shape'])
+        )
+        with open(os.path.join(directory, 'vocab.txt'), encoding='utf-8') as f:
+            self.vocab = f.read().split('\n') if self.matrix.shape[1] else []
+        self.word_index = {word: j for j, word in enumerate(self.vocab)}
+        self.docs = pd.read_csv(os.path.join(directory, 'docs.csv'), dtype={'StockCode': str})
+        self._idf = None
+
+    def lexicon_matrix(self, categories):
+        """
+        词表 × 类别 的 0/1 指示矩阵；词表中没有出现过的词条直接忽略
+        """
+        rows, cols = [], []
+        for k, terms in enumerate(categories.values()):
+            for term in set(terms):
+                j = self.word_index.get(term)
+                if j is not None:
+                    rows.append(j)
+                    cols.append(k)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(self.vocab), len(categories))
+        )
+
+    def word_count(self):
+        """
+        每行 (每份内容) 的总词数
+        """
+        return np.asarray(self.matrix.sum(axis=1), dtype=np.int64).ravel()
+
+    def idf(self):
+        """
+        平滑的逆文档频率 idf = ln((1 + N) / (1 + df)) + 1 (与 sklearn 的 TfidfTransformer 一致)
+        """
+        if self._idf is None:
+            n_docs = self.matrix.shape[0]
+            df = np.bincount(self.matrix.indices, minlength=self.matrix.shape[1])
+            self._idf = np.log((1 + n_docs) / (1 + df)) + 1
+        return self._idf
+
+    def _to_docs(self, values):
+        """
+        把按矩阵行计算的结果展开到 docs.csv 的每个文件
+        """
+        frame = values.reset_index(drop=True)
+        frame['Row'] = frame.index
+        out = self.docs.merge(frame, on='Row', how='left')
+        return out.drop(columns=['Row', 'sha256', 'file_name'])
+
+    def lexicon_ratios(self, categories, min_words=100):
+        """
+        各类别词数 / 总词数，输出列与 extract_tone 相同 ("类别名_Tone" 和 Word_Count)；
+        总词数少于 min_words 的文档不输出 (与 extract_tone 的过滤规则一致)
+        """
+        counts = self.matrix @ self.lexicon_matrix(categories)
+        counts = counts.toarray() if sparse.issparse(counts) else np.asarray(counts)
+        total = self.word_count()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = counts / total[:, None]
+        frame = pd.DataFrame(ratios, columns=[f'{name}_Tone' for name in categories])
+        frame['Word_Count'] = total
+        out = self._to_docs(frame)
+        return out[out['Word_Count'] >= min_words].reset_index(drop=True)
+
+    def tfidf_tone(self, categories, sublinear_tf=True, min_words=100):
+        """
+        TF-IDF 加权语调：每个词的权重为 (1 + ln tf) × idf (sublinear_tf=False 时为 tf × idf)，
+        类别语调 = 类别内词的权重之和 / 全部词的权重之和
+        """
+        weighted = self.matrix.astype(np.float64)
+        if sublinear_tf:
+            weighted.data = 1 + np.log(weighted.data)
+        weighted = weighted @ sparse.diags(self.idf())
+        scores = (weighted @ self.lexicon_matrix(categories)).toarray()
+        norm = np.asarray(weighted.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = scores / norm[:, None]
+        frame = pd.DataFrame(scores, columns=[f'{name}_TfIdf_Tone' for name in categories])
+        frame['Word_Count'] = self.word_count()
+        out = self._to_docs(frame)
+        return out[out['Word_Count'] >= min_words].reset_index(drop=True)
+
+    def score_many(self, dictionaries, min_words=100):
+        """
+        一次计算多套候选词典 {词典名: {类别名: 词条集合}}，返回长表 (Dictionary 列区分)，用于稳健性检验
+        """
+        frames = []
+        for dict_name, categories in dictionaries.items():
+            frame = self.lexicon_ratios(categories, min_words)
+            frame.insert(0, 'Dictionary', dict_name)
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+if __name__ == "__main__":
+    import extract_tone
+
+    if not os.path.exists(os.path.join(DTM_DIR, 'meta.json')):
+        print(f"错误：找不到 {DTM_DIR}/，请先在 extract_tone.py 中设置 DTM_DIR 并运行一次。")
+    else:
+        start = time.perf_counter()
+        dtm = DocTermMatrix(DTM_DIR)
+        df = dtm.lexicon_ratios(extract_tone.lexicon_categories())
+        df.sort_values(by=['StockCode', 'Year'], inplace=True)
+        df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+        print(f"矩阵: {dtm.matrix.shape[0]} 份文档 × {dtm.matrix.shape[1]} 个词，非零元素 {dtm.matrix.nnz}")
+        print(f"用时 {time.perf_counter() - start:.2f} 秒，结果已保存为: {OUTPUT_FILE}")
@@ -1,8 +1,11 @@
 import pandas as pd
-import requests
 import os
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import http_client
+from pdf_store import PdfStore
 
 # =================配置区域=================
 # 1. 读取上一名为生成的 CSV 文件名
@@ -11,32 +14,262 @@ INPUT_CSV = 'annual_report_links_full.csv'
 # 2. 设置 PDF 保存的文件夹名称
 SAVE_DIR = 'pdf_reports'
 
+# 3. 下载模式：'parallel' 为多线程并行下载；'serial' 为原来的逐个下载
+DOWNLOAD_MODE = 'parallel'
+MAX_WORKERS = 8  # 并行下载的线程数
+CHUNK_SIZE = 1024 * 1024  # 每次写盘的块大小 (字节)，年报通常 5-20 MB
+PART_SUFFIX = '.part'  # 下载中的临时文件后缀，校验通过后才改名为正式文件
+VALIDATOR_SUFFIX = '.part.validator'  # 记录 .part 对应的 ETag / Last-Modified，续传时作为 If-Range 发送
+
+# 4. 内容寻址仓库：下载前先查清单，字节相同的年报只保存一份 (见 pdf_store.py)
+USE_PDF_STORE = True
+STORE = None  # 主程序中初始化的 PdfStore 实例
+
 
 # =========================================
 
-def download_pdf(url, save_path):
+def looks_like_pdf(head, tail):
+    """
+    以 %PDF 开头、末尾含 %%EOF (%%EOF 之后可能还跟着换行或少量填充，所以 tail 取末尾 1 KB)
+    """
+    return head[:5] == b'%PDF-' and b'%%EOF' in tail
+
+
+def is_valid_pdf(path, expected_size=None):
     """
-    下载单个 PDF 文件的函数
+    校验 PDF 是否完整：大小与 Content-Length 一致，以 %PDF 开头、末尾含 %%EOF
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
     try:
-        # 发送请求，设置超时为 30 秒
-        response = requests.get(url, headers=headers, stream=True, timeout=30)
+        size = os.path.getsize(path)
+        if size == 0 or (expected_size is not None and size != expected_size):
+            return False
+        with open(path, 'rb') as f:
+            head = f.read(5)
+            f.seek(max(0, size - 1024))
+            return looks_like_pdf(head, f.read())
+    except OSError:
+        return False
+
+
+def parse_total_size(response, offset):
+    """
+    从响应头推算文件总大小：206 看 Content-Range 的 "/总大小"，200 看 Content-Length
+    """
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('*'):
+        return int(content_range.rsplit('/', 1)[1])
+    content_length = response.headers.get('Content-Length')
+    if content_length is not None:
+        return offset + int(content_length)
+    return None
+
+
+def response_validator(response):
+    """
+    可用于 If-Range 的校验值：强 ETag 优先 (弱 ETag 不能用于 If-Range)，其次 Last-Modified；都没有时返回 None
+    """
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def read_validator(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def validator_file(part_path):
+    return part_path[:-len(PART_SUFFIX)] + VALIDATOR_SUFFIX
+
 
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+def remove_partial(part_path):
+    for path in (part_path, validator_file(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_pdf(url, save_path, chunk_size=CHUNK_SIZE):
+    """
+    下载单个 PDF 文件的函数：
+    先写入 .part 临时文件，中断后下次用 HTTP Range 从断点继续，
+    校验大小与 %PDF/%%EOF 后才原子改名为正式文件。
+    续传时带上第一次下载时记录的 If-Range (ETag / Last-Modified)：服务器上的文件已经变了就会返回 200 和完整文件，
+    此时从头重写，不会把旧文件的前半段和新文件的后半段拼在一起；没有记录校验值的 .part 也从头下载。
+    请求都带 Accept-Encoding: identity：Range 偏移和 Content-Length 都按未压缩的文件字节计算，
+    与 .part 中写入的字节一致；服务器仍然压缩传输时不校验大小，也不记录校验值 (中断后从头下载)
+    """
+    part_path = save_path + PART_SUFFIX
+    validator_path = validator_file(part_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = read_validator(validator_path) if offset else None
+    if validator is None:
+        offset = 0
+    headers = {'Accept-Encoding': 'identity'}
+    if offset:
+        headers.update({'Range': f'bytes={offset}-', 'If-Range': validator})
+
+    try:
+        # 共享客户端：static.cninfo.com.cn 长连接复用，5xx/超时自动退避重试，请求头统一
+        response = http_client.get(url, headers=headers, stream=True, timeout=30)
+
+        if response.status_code == 416:
+            # 临时文件已经是完整大小，服务器没有剩余字节可给
+            total_size = None
+            response.close()
+        elif response.status_code == 206 and 'Content-Encoding' in response.headers:
+            # 压缩后的字节区间无法接在 .part 的原始字节之后，丢弃临时文件，下次从头下载
+            response.close()
+            print("服务器对续传请求返回了压缩内容，已删除临时文件")
+            remove_partial(part_path)
+            return False
+        elif response.status_code in (200, 206):
+            if response.status_code == 200:
+                # 服务器不支持 Range，或 If-Range 不匹配 (文件已变化) 时返回完整文件，从头下载
+                offset = 0
+                new_validator = None if 'Content-Encoding' in response.headers else response_validator(response)
+                if new_validator:
+                    with open(validator_path, 'w', encoding='utf-8') as f:
+                        f.write(new_validator)
+                elif os.path.exists(validator_path):
+                    os.remove(validator_path)
+            # 压缩传输时 Content-Length 是压缩后的大小 (iter_content 写入的是解压后的字节)
+            total_size = None if 'Content-Encoding' in response.headers else parse_total_size(response, offset)
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
                     f.write(chunk)
-            return True
         else:
             print(f"下载失败，状态码: {response.status_code}")
             return False
     except Exception as e:
+        # 保留 .part 文件，下次从已下载的字节继续
         print(f"下载出错: {e}")
         return False
 
+    if not is_valid_pdf(part_path, total_size):
+        print("校验失败 (大小不符或不是完整的 PDF)，已删除临时文件")
+        remove_partial(part_path)
+        return False
+
+    os.replace(part_path, save_path)
+    if os.path.exists(validator_path):
+        os.remove(validator_path)
+    return True
+
+
+def fetch_pdf_bytes(url):
+    """
+    下载到内存 (pipeline.py 的内存模式)：不写盘，校验大小与 %PDF/%%EOF 后返回字节串，失败返回 None
+    """
+    try:
+        response = http_client.get(url, timeout=30)
+    except Exception as e:
+        print(f"下载出错: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"下载失败，状态码: {response.status_code}")
+        return None
+
+    data = response.content
+    expected_size = response.headers.get('Content-Length')
+    if 'Content-Encoding' in response.headers:
+        expected_size = None  # 压缩传输时 Content-Length 是压缩后的大小
+    if not looks_like_pdf(data[:5], data[-1024:]) or (expected_size and int(expected_size) != len(data)):
+        print("校验失败 (大小不符或不是完整的 PDF)")
+        return None
+    return data
+
+
+def prepare_existing(save_path):
+    """
+    已存在的正式文件先做完整性校验；
+    旧版本留下的截断文件没有记录 ETag / Last-Modified，无法确认服务器上的文件没变，删除后从头下载
+    """
+    if not os.path.exists(save_path):
+        return False
+    if is_valid_pdf(save_path):
+        return True
+    os.remove(save_path)
+    return False
+
+
+def build_tasks(df):
+    """
+    把链接表转换为 (文件名, 链接, 保存路径, 股票代码, 发布日期) 列表；
+    同名文件只保留第一条，避免两个线程同时写同一个临时文件
+    """
+    tasks = []
+    seen = set()
+    for _, row in df.iterrows():
+        stock_code = str(row['StockCode']).zfill(6)  # 补全代码为6位
+        publish_date = row['PublishDate']
+        # 构建文件名: 股票代码_发布日期.pdf (例如: 000001_2023-03-15.pdf)
+        file_name = f"{stock_code}_{publish_date}.pdf"
+        if file_name in seen:
+            continue
+        seen.add(file_name)
+        tasks.append((file_name, row['PDF_Link'], os.path.join(SAVE_DIR, file_name), stock_code, publish_date))
+    return tasks
+
+
+def download_task(task):
+    """
+    单个下载任务 (供线程池调用)，返回 '已存在' / '下载成功' / '失败'
+    """
+    file_name, pdf_url, save_path, stock_code, publish_date = task
+
+    # 清单里已有该链接：直接从内容仓库恢复，不走网络
+    if STORE is not None:
+        record = STORE.lookup_url(pdf_url)
+        if record:
+            STORE.restore(record, save_path)
+            return '已存在'
+
+    # 检查是否已存在且完整（断点续传功能）
+    if prepare_existing(save_path):
+        status = '已存在'
+    elif download_pdf(pdf_url, save_path):
+        status = '下载成功'
+    else:
+        return '失败'
+
+    if STORE is not None:
+        STORE.add_file(save_path, stock_code, pdf_url, publish_date)
+    return status
+
+
+def run_serial(tasks):
+    success_count = 0
+    for index, task in enumerate(tasks):
+        # 进度提示
+        print(f"[{index + 1}/{len(tasks)}] 处理: {task[0]} ...", end="")
+        status = download_task(task)
+        print(f" [{status}]")
+        if status != '失败':
+            success_count += 1
+        if status != '已存在':
+            # 随机休眠，避免对服务器造成压力
+            time.sleep(random.uniform(0.5, 1.5))
+    return success_count
+
+
+def run_parallel(tasks):
+    """
+    线程池并行下载；限流时由 http_client 的全局熔断器让所有线程一起暂停
+    """
+    success_count = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(download_task, task): task for task in tasks}
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            status = future.result()
+            print(f"[{done_count}/{len(tasks)}] {futures[future][0]} [{status}]")
+            if status != '失败':
+                success_count += 1
+    return success_count
+
 
 if __name__ == "__main__":
     # 1. 检查 CSV 文件是否存在
@@ -49,44 +282,27 @@ if __name__ == "__main__":
         os.makedirs(SAVE_DIR)
         print(f"已创建文件夹: {SAVE_DIR}")
 
+    if USE_PDF_STORE:
+        STORE = PdfStore()
+
     # 3. 读取链接列表
     print("正在读取下载列表...")
     df = pd.read_csv(INPUT_CSV)
-    total_files = len(df)
+    tasks = build_tasks(df)
+    total_files = len(tasks)
     print(f"共读取到 {total_files} 个待下载文件。")
 
-    # 4. 开始循环下载
-    success_count = 0
-
-    for index, row in df.iterrows():
-        stock_code = str(row['StockCode']).zfill(6)  # 补全代码为6位
-        publish_date = row['PublishDate']
-        pdf_url = row['PDF_Link']
-
-        # 构建文件名: 股票代码_发布日期.pdf (例如: 000001_2023-03-15.pdf)
-        file_name = f"{stock_code}_{publish_date}.pdf"
-        save_path = os.path.join(SAVE_DIR, file_name)
-
-        # 进度提示
-        print(f"[{index + 1}/{total_files}] 处理: {file_name} ...", end="")
-
-        # 检查是否已存在（断点续传功能）
-        if os.path.exists(save_path):
-            print(" [已存在，跳过]")
-            success_count += 1
-            continue
-
-        # 执行下载
-        if download_pdf(pdf_url, save_path):
-            print(" [下载成功]")
-            success_count += 1
-        else:
-            print(" [失败]")
+    # 4. 开始下载
+    if DOWNLOAD_MODE == 'parallel':
+        print(f"并行模式：{MAX_WORKERS} 个线程，块大小 {CHUNK_SIZE // 1024} KB")
+        success_count = run_parallel(tasks)
+    else:
+        success_count = run_serial(tasks)
 
-        # 随机休眠，避免对服务器造成压力
-        time.sleep(random.uniform(0.5, 1.5))
+    if STORE is not None:
+        STORE.close()
 
     print("\n" + "=" * 30)
     print(f"任务结束！成功下载: {success_count}/{total_files}")
     print(f"文件保存在: {os.path.abspath(SAVE_DIR)}")
-    print("=" * 30)
\ No newline at end of file
+    print("=" * 30)
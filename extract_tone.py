@@ -1,12 +1,77 @@
 import os
-import pdfplumber
 import jieba
 import pandas as pd
 import re
+import logging
+import hashlib
+import time
+from multiprocessing import Pool
+
+import adaptive_sampling
+import jieba_setup
+import near_dup
+import text_cache
+import work_queue
+from doc_term_matrix import build_matrix, save_matrix
+from lexicon import CompiledLexicon, load_lexicon_file
+from mdna_locator import locate_section
+from pdf_backends import open_pdf
+from pdf_store import STORE_DIR, PdfStore, hash_file
+from tone_store import TONE_DB, ToneStore, publish_date
 
 # =================配置区域=================
 PDF_DIR = 'pdf_reports'  # PDF 所在的文件夹
 OUTPUT_FILE = 'tone_results.csv'  # 结果保存的文件名
+USE_PDF_STORE = True  # 优先从 pdf_store 清单读取文件哈希，字节相同的年报只解析一次
+
+# 并行解析：WORKERS > 1 时使用进程池，每个进程只初始化一次 jieba
+WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 4  # 每次派发给一个进程的文件数
+MAX_TASKS_PER_CHILD = 200  # 每个进程处理这么多文件后重启，防止 pdfplumber 内存持续增长
+
+# PDF 文本提取后端 (见 pdf_backends.py)：'pdfplumber' (默认) / 'pypdfium2' / 'pdfminer'
+# 更换前建议先运行 benchmark_pdf_backends.py 确认语调差异在可接受范围内
+PDF_BACKEND = 'pdfplumber'
+
+# 页面选择策略：'mdna' 只读取"管理层讨论与分析"一节 (见 mdna_locator.py)，定位失败时退回前 50 页规则，
+# 并在结果中记录实际读取的页码范围；'first_pages' 为原来的前 50 页 / 前一半页面，输出列与历史版本相同
+PAGE_STRATEGY = 'mdna'
+
+# 自适应抽页 (参数见 adaptive_sampling.py)：在选定的页面范围内按分层顺序逐页读取，
+# 各类别语调比率的置信区间足够窄时提前停止；结果中增加 Pages_Read / Pages_Total 和各类别的 *_Tone_CI
+# (95% 置信区间半宽)，Word_Count 为实际读取的词数。False 时读取全部页面
+ADAPTIVE_SAMPLING = False
+
+# 跨页分词：每页末尾留下这么多字与下一页拼接后再分词，跨页的词不会被切断 (长度超过它的词条极少)
+TOKEN_CARRY_CHARS = 16
+
+# 金融词典 (见 jieba_setup.py)：加载预先合并并序列化的 jieba 词典，金融术语和所有情感词条都整体切分
+USE_FINANCE_DICT = True
+
+# 提取结果缓存 (见 text_cache.py)：只改词典时直接复用缓存的逐页文本与分词结果，不再解析 PDF
+USE_TEXT_CACHE = True
+
+# 近似重复检测 (参数见 near_dup.py)：同一股票同一年份的多份文件 (修订版、换日期重传) 前几页几乎相同时，
+# 只保留一份 (默认保留发布日期最新的)，其余跳过解析并记录到 NEAR_DUP_REPORT
+NEAR_DUP_DETECTION = True
+NEAR_DUP_REPORT = 'near_duplicates.csv'
+
+# 结果库 (见 tone_store.py)：每份文件解析完立即写入，重新运行时跳过当前词典版本下已有结果的文件
+USE_TONE_STORE = True
+
+# 多节点任务队列 (见 work_queue.py)：多台机器通过共享挂载读取同一个 PDF_DIR 时，设置为共享位置上的任务表路径
+# (如 'pdf_reports/work_queue.sqlite')，各节点分批领取文件、带租约处理，崩溃节点的文件在租约到期后被重新领取。
+# None 表示原来的单机模式
+WORK_QUEUE_DB = None
+# 本节点在任务队列中的角色：
+#   'plan'   列出 PDF_DIR、按内容去重和近似去重后写入任务表 (只在一个节点上运行；新下载了文件时再运行一次)
+#   'worker' 只领取任务解析，不扫描文件夹 (各节点同时运行多个也没问题)
+#   'export' 只把任务表中已完成的结果导出为 OUTPUT_FILE (任意节点、任意时刻都可以重新导出)
+QUEUE_ROLE = 'worker'
+
+# 文档-词频矩阵 (见 doc_term_matrix.py)：设置目录 (如 'dtm') 后，解析结束时把有效文档的分词结果保存为稀疏矩阵，
+# 之后新增或比较词典只需矩阵乘法，不必重新解析 PDF。None 表示不保存
+DTM_DIR = None
 
 # 简易版中文金融情感词典 (论文 Source 32, 147 要求)
 # 注意：正式发 SCI 时，建议扩充这个词表 (可以搜索 "Loughran McDonald Chinese Dictionary")
@@ -26,9 +91,24 @@ UNCERTAINTY_WORDS = set([
     '预期', '大约', '似乎', '假如', '一旦', '风险', '变动', '尚未', '未定'
 ])
 
+# 类别名 -> 词表，输出列为 "类别名_Tone"。
+# 注意："风险" 同时属于负面词和不确定词，两类都计数 (编译词典按位掩码显式支持一词多类)
+LEXICON = {
+    'Positive': POSITIVE_WORDS,
+    'Negative': NEGATIVE_WORDS,
+    'Uncertainty': UNCERTAINTY_WORDS,
+}
+# 大规模词典 (如 Loughran-McDonald 中文版) 可以放在 CSV 中 (两列: term, category)，设置后替代上面的内置词表
+LEXICON_FILE = None
+# 短语匹配：被 jieba 切开的词条 (如 "或将" -> "或" + "将") 也按原词条计数
+PHRASE_MATCHING = True
+
 
 # =========================================
 
+NON_CJK = re.compile(r'[^\u4e00-\u9fa5]')
+
+
 def get_year_from_filename(filename):
     """
     从文件名 (000001_2023-04-20.pdf) 推算财报年份
@@ -44,97 +124,649 @@ def get_year_from_filename(filename):
     return None
 
 
-def analyze_pdf(file_path):
+def select_pages(pdf, strategy):
     """
-    核心函数：读取 PDF -> 提取文本 -> Jieba分词 -> 统计词频
+    决定要读取的页面范围，返回 {'start', 'end' (不含), 'source'}
     """
-    full_text = ""
+    if strategy == 'mdna':
+        section = locate_section(pdf)
+        if section:
+            return section
+
+    # 策略：为了速度，只读取前 50 页或前 30% 的页面
+    # 因为 MD&A (管理层讨论) 通常在年报的前 1/3 部分
+    total_pages = pdf.page_count()
+    return {'start': 0, 'end': min(50, int(total_pages * 0.5)), 'source': 'first_pages'}
+
+
+def open_pages(file_path, backend=None, strategy=None, section=None):
+    """
+    打开 PDF 并确定页面范围，返回 (逐页清洗后文本的生成器, 页面范围)。
+    给出 section 时直接读取这一范围，不再定位 (用于让不同后端读取相同的页面)。
+    文本只保留中文字符，空白页为空字符串；生成器读完 (或被关闭) 时关闭 PDF，任何时刻只持有一页文本
+    """
+    pdf = open_pdf(file_path, backend or PDF_BACKEND)
     try:
-        with pdfplumber.open(file_path) as pdf:
-            # 策略：为了速度，只读取前 50 页或前 30% 的页面
-            # 因为 MD&A (管理层讨论) 通常在年报的前 1/3 部分
-            total_pages = len(pdf.pages)
-            read_pages = min(50, int(total_pages * 0.5))
-
-            for i in range(read_pages):
-                page_text = pdf.pages[i].extract_text()
-                if page_text:
-                    full_text += page_text
-    except Exception as e:
-        print(f"  [读取失败] {e}")
-        return None
+        if section is None:
+            section = select_pages(pdf, strategy or PAGE_STRATEGY)
+        else:
+            section = {**section, 'end': min(section['end'], pdf.page_count())}
+    except Exception:
+        pdf.close()
+        raise
 
-    if not full_text:
-        return None
+    def pages():
+        try:
+            for i in range(section['start'], section['end']):
+                # 简单的文本清洗：只保留中文字符 (逐页清洗后拼接与整体清洗结果相同)
+                yield NON_CJK.sub('', pdf.page_text(i) or '')
+        finally:
+            pdf.close()
+
+    return pages(), section
+
+
+def extract_pages(file_path, backend=None, strategy=None, section=None):
+    """
+    读取 PDF 的目标页面，返回 (逐页清洗后的文本列表, 页面范围)
+    """
+    pages, section = open_pages(file_path, backend, strategy, section)
+    return list(pages), section
+
+
+def iter_tokens(pages):
+    """
+    逐页 Jieba 分词，产出词流。每页末尾留下至少 TOKEN_CARRY_CHARS 个字的词不输出，
+    拼到下一页开头重新分词，跨页的词不会被切断。这是近似做法：清洗后的文本只剩汉字，没有标点可作为
+    确定的断句位置，下一页开头的字偶尔会改变保留部分之前的切分 (动态规划 / HMM 的影响超出 TOKEN_CARRY_CHARS 个字)，
+    因此不保证与整篇拼接后分词的结果逐词相同；样本年报上两者一致，语调比率的差异可以忽略
+    """
+    carry = ''
+    for page in pages:
+        text = carry + page
+        if not text:
+            continue
+        words = jieba.lcut(text)
+        k, held = len(words), 0
+        while k > 0 and held < TOKEN_CARRY_CHARS:
+            k -= 1
+            held += len(words[k])
+        yield from words[:k]
+        carry = ''.join(words[k:])
+    if carry:
+        yield from jieba.cut(carry)
+
+
+_compiled_lexicon = None
+
+
+def lexicon_categories():
+    """
+    情感词典 {类别名: 词条集合}：设置了 LEXICON_FILE 时从文件读取，否则为内置词表
+    """
+    return load_lexicon_file(LEXICON_FILE) if LEXICON_FILE else LEXICON
+
+
+def get_lexicon():
+    """
+    每个进程第一次使用时编译一次词典
+    """
+    global _compiled_lexicon
+    if _compiled_lexicon is None:
+        categories = lexicon_categories()
+        _compiled_lexicon = CompiledLexicon(categories, tokenize=jieba.lcut if PHRASE_MATCHING else None)
+    return _compiled_lexicon
 
-    # --- 开始文本挖掘 (Source 31, 146) ---
-    # 1. 简单的文本清洗
-    full_text = re.sub(r'[^\u4e00-\u9fa5]', '', full_text)  # 只保留中文字符
 
-    # 2. Jieba 分词
-    words = list(jieba.cut(full_text))
-    total_words = len(words)
+def scoring_version():
+    """
+    结果库中的词典版本：词典内容、短语匹配开关、提取器和分词器 (含金融词典签名) 任一变化都视为新版本。
+    需要在 init_jieba() 之后调用
+    """
+    digest = hashlib.sha1(f"phrase={PHRASE_MATCHING}\n".encode())
+    for name, terms in lexicon_categories().items():
+        digest.update(f"{name}:{','.join(sorted(terms))}\n".encode('utf-8'))
+    extractor = text_cache.extractor_key(PDF_BACKEND, PAGE_STRATEGY)
+    if ADAPTIVE_SAMPLING:
+        extractor += (f"-adaptive-{adaptive_sampling.ORDER}-{adaptive_sampling.CI_WIDTH}"
+                      f"-{adaptive_sampling.MIN_PAGES}")
+    return f"lex-{digest.hexdigest()[:12]}/{extractor}/{text_cache.tokenizer_version()}"
+
+
+def init_jieba():
+    """
+    初始化 jieba，返回 (耗时秒数, 状态)；启用金融词典时所有情感词条都加入词典
+    """
+    jieba.setLogLevel(logging.WARNING)
+    if not USE_FINANCE_DICT:
+        start = time.perf_counter()
+        jieba.initialize()
+        return time.perf_counter() - start, 'default'
+    terms = set().union(*lexicon_categories().values())
+    return jieba_setup.setup(terms)
+
+
+def score_tokens(words):
+    """
+    统计语调 (Source 33, 148)：一次遍历得到所有类别的计数，再计算比率
+    """
+    lexicon = get_lexicon()
+    counts, total_words = lexicon.count(words)
 
     if total_words < 100:  # 过滤掉只有几句话的无效文件
         return None
 
-    # 3. 统计语调 (Source 33, 148)
-    pos_count = sum(1 for w in words if w in POSITIVE_WORDS)
-    neg_count = sum(1 for w in words if w in NEGATIVE_WORDS)
-    unc_count = sum(1 for w in words if w in UNCERTAINTY_WORDS)
+    tone_data = {f'{name}_Tone': count / total_words for name, count in zip(lexicon.names, counts)}
+    tone_data['Word_Count'] = total_words
+    return tone_data
+
 
-    # 4. 计算比率
+def tokenize_pdf(file_path, sha256=None):
+    """
+    读取 PDF -> 提取文本 -> Jieba 分词，返回 (词迭代器, 页面范围)；打开失败时抛出异常。
+    各环节都是逐页的生成器，内存只与单页大小有关；读到中途出错时由迭代器抛出异常。
+    传入 sha256 时优先使用 text_cache 中的分词结果或逐页文本，只有文件或提取器变化才重新解析 PDF，
+    未命中时边读边写缓存。
+    """
+    use_cache = USE_TEXT_CACHE and sha256 is not None
+    version = text_cache.extractor_key(PDF_BACKEND, PAGE_STRATEGY)
+    cached = text_cache.open_tokens(sha256, version) if use_cache else None
+    if cached is not None:
+        return cached
+
+    cached = text_cache.open_pages(sha256, version) if use_cache else None
+    if cached is not None:
+        pages, section = cached
+    else:
+        pages, section = open_pages(file_path)
+        if use_cache:
+            pages = text_cache.tee_pages(sha256, pages, version, section)
+
+    # --- 开始文本挖掘 (Source 31, 146) ---
+    # Jieba 分词
+    words = iter_tokens(pages)
+    if use_cache:
+        words = text_cache.tee_tokens(sha256, words, version, section)
+    return words, section
+
+
+def section_columns(section):
+    """
+    输出中记录实际读取的页码范围 (从 1 开始，含首尾) 及其来源 (outline / toc / first_pages)
+    """
     return {
-        'Positive_Tone': pos_count / total_words,
-        'Negative_Tone': neg_count / total_words,
-        'Uncertainty_Tone': unc_count / total_words,
-        'Word_Count': total_words
+        'Section_Source': section.get('source'),
+        'Section_Start_Page': section['start'] + 1,
+        'Section_End_Page': section['end'],
     }
 
 
-# =================主程序=================
-if __name__ == "__main__":
-    results = []
+def sample_pdf(file_path, sha256=None):
+    """
+    自适应抽页：逐页读取并计数，置信区间足够窄时停止，返回 (语调结果, 页面范围)。
+    有逐页文本缓存时直接从缓存中抽页；只读了部分页面，因此不写入缓存
+    """
+    lexicon = get_lexicon()
+    version = text_cache.extractor_key(PDF_BACKEND, PAGE_STRATEGY)
+    cached = text_cache.open_pages(sha256, version) if USE_TEXT_CACHE and sha256 is not None else None
+
+    pdf = None
+    if cached is not None:
+        pages, section = cached
+        read_page = list(pages).__getitem__
+    else:
+        pdf = open_pdf(file_path, PDF_BACKEND)
+
+        def read_page(i):
+            return NON_CJK.sub('', pdf.page_text(section['start'] + i) or '')
+
+    try:
+        if pdf is not None:
+            section = select_pages(pdf, PAGE_STRATEGY)
+        sample = adaptive_sampling.sample_pages(
+            read_page, lambda text: lexicon.count(jieba.cut(text)),
+            section['end'] - section['start'], lexicon.names
+        )
+    finally:
+        if pdf is not None:
+            pdf.close()
+
+    total_words = sample['words']
+    if total_words < 100:  # 过滤掉只有几句话的无效文件
+        return None, section
+    tone_data = {f'{name}_Tone': count / total_words for name, count in zip(lexicon.names, sample['counts'])}
+    tone_data['Word_Count'] = total_words
+    for name, halfwidth in zip(lexicon.names, sample['halfwidths']):
+        tone_data[f'{name}_Tone_CI'] = halfwidth
+    tone_data['Pages_Read'] = sample['pages_read']
+    tone_data['Pages_Total'] = sample['pages_total']
+    return tone_data, section
 
-    # 获取文件列表
-    files = [f for f in os.listdir(PDF_DIR) if f.endswith('.pdf')]
-    total_files = len(files)
 
-    print(f"开始处理 {total_files} 份 PDF 文件，这可能需要一些时间...")
+def analyze_pdf(file_path, sha256=None):
+    """
+    核心函数：读取 PDF -> 提取文本 -> Jieba分词 -> 统计词频 (逐页流式处理)。
+    文本太少时返回 None；读取或解析出错时抛出异常 (由 process_file 转为 Failure)
+    """
+    if ADAPTIVE_SAMPLING:
+        tone_data, section = sample_pdf(file_path, sha256)
+    else:
+        words, section = tokenize_pdf(file_path, sha256)
+        tone_data = score_tokens(words)
+    if tone_data and PAGE_STRATEGY == 'mdna':
+        tone_data.update(section_columns(section))
+    return tone_data
 
-    for index, filename in enumerate(files):
-        print(f"[{index + 1}/{total_files}] 分析: {filename} ...", end="")
 
+class Failure:
+    """
+    解析时出现异常的结果 (reason 为异常说明)。布尔值为假，与 "文本太少" 的 None 一样不输出语调行；
+    但结果库把它记为 error 而不是 empty，下次运行会重新解析
+    """
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"Failure({self.reason!r})"
+
+
+def failure_reason(tone_data):
+    """
+    结果为 Failure 时返回原因 (传给 ToneStore.save 的 error)，否则返回 None
+    """
+    return tone_data.reason if isinstance(tone_data, Failure) else None
+
+
+def result_status(tone_data):
+    if isinstance(tone_data, Failure):
+        return f"解析异常，下次重试: {tone_data.reason}"
+    return "完成" if tone_data else "内容为空"
+
+
+def init_worker():
+    """
+    进程池初始化：每个进程只加载一次 jieba 词典，并编译一次情感词典。
+    主进程已经初始化过时，fork 出的子进程直接继承，不再重复加载
+    """
+    seconds, status = init_jieba()
+    get_lexicon()
+    if status != 'ready':
+        print(f"  [进程 {os.getpid()}] jieba 词典加载完成，用时 {seconds:.2f} 秒 ({status})")
+
+
+def process_file(task):
+    """
+    进程池的任务函数 (task 为 (文件路径, sha256))：单个文件出任何异常都只影响它自己，不会中断整批任务，
+    异常转为 Failure 返回
+    """
+    file_path, sha256 = task
+    try:
+        return analyze_pdf(file_path, sha256)
+    except Exception as e:
+        print(f"  [解析异常] {os.path.basename(file_path)}: {e}")
+        return Failure(f"{type(e).__name__}: {e}")
+
+
+def plan_files(files, store=None):
+    """
+    解析文件名中的代码和年份，并取内容哈希去重。
+    返回待输出的 [(文件名, 代码, 年份, sha256)]，以及需要实际解析的 {sha256: 文件路径}
+    """
+    entries = []
+    to_analyze = {}
+    emitted = set()  # 已计划输出的 (代码, 年份, sha256)，避免重复行
+
+    for filename in files:
         # 解析股票代码和年份
         stock_code = filename.split('_')[0]
         year = get_year_from_filename(filename)
 
         if not year:
-            print(" [跳过:无法解析年份]")
+            print(f"{filename} [跳过:无法解析年份]")
             continue
 
         file_path = os.path.join(PDF_DIR, filename)
 
-        # 执行分析
-        tone_data = analyze_pdf(file_path)
+        # 先查清单拿内容哈希，清单里没有时才读文件计算
+        record = store.lookup_file(filename) if store is not None else None
+        sha256 = record['sha256'] if record else hash_file(file_path)
+        if (stock_code, year, sha256) in emitted:
+            print(f"{filename} [跳过:内容重复]")
+            continue
+
+        emitted.add((stock_code, year, sha256))
+        entries.append((filename, stock_code, year, sha256))
+        # 同一内容只解析一次
+        to_analyze.setdefault(sha256, file_path)
+
+    return entries, to_analyze
 
+
+def first_pages_text(file_path):
+    """
+    读取前 near_dup.FIRST_PAGES 页的原始文本，用于计算近似重复指纹
+    """
+    pdf = open_pdf(file_path, PDF_BACKEND)
+    try:
+        return ''.join(pdf.page_text(i) or '' for i in range(min(near_dup.FIRST_PAGES, pdf.page_count())))
+    finally:
+        pdf.close()
+
+
+def drop_near_duplicates(entries):
+    """
+    在 plan_files 的结果中去掉近似重复的文件：只有同一分组 (同一股票同一年份) 有多份文件时才计算指纹，
+    指纹按 sha256 缓存。返回 (保留的条目, 重复报告列表)
+    """
+    signatures = near_dup.SignatureStore()
+    hasher = near_dup.MinHasher()
+    sha_of = {filename: sha256 for filename, _, _, sha256 in entries}
+
+    def get_signature(filename):
+        signature = signatures.get(sha_of[filename])
+        if signature is None:
+            try:
+                text = first_pages_text(os.path.join(PDF_DIR, filename))
+            except Exception:
+                return None  # 打不开的文件不参与比较，之后照常解析并报告
+            # 扫描件等文字太少的文件没有签名 (None)，同样不参与比较
+            signature = hasher.signature(near_dup.shingles(text))
+            signatures.put(sha_of[filename], signature)
+        return signature if signature is not None and signature.size else None
+
+    docs = []
+    for filename, stock_code, year, _ in entries:
+        group = (stock_code, year) if near_dup.SCOPE == 'year' else stock_code
+        docs.append((filename, group, (publish_date(filename) or '', filename)))
+    try:
+        duplicates = near_dup.find_near_duplicates(docs, get_signature)
+    finally:
+        signatures.close()
+
+    kept, report = [], []
+    for entry in entries:
+        filename, stock_code, year, _ = entry
+        if filename not in duplicates:
+            kept.append(entry)
+            continue
+        canonical, score = duplicates[filename]
+        print(f"{filename} [跳过:与 {canonical} 近似重复，相似度 {score:.2f}]")
+        report.append({'File': filename, 'StockCode': stock_code, 'Year': year,
+                       'Canonical_File': canonical, 'Similarity': score})
+    return kept, report
+
+
+def run_extraction(tasks, workers=WORKERS, on_result=None, pool=None):
+    """
+    按给定顺序解析全部 (文件路径, sha256) 任务，返回一一对应的语调结果列表。
+    workers > 1 时使用进程池分块派发，imap 保证结果顺序与输入一致；传入 pool 时复用已有的进程池。
+    on_result(序号, 语调结果) 在主进程中每得到一个结果就调用一次 (用于逐条写入结果库)。
+    """
+    total_files = len(tasks)
+    tone_list = []
+
+    def report(index, tone_data):
+        print(f"[{index + 1}/{total_files}] 分析: {os.path.basename(tasks[index][0])} ... "
+              f"[{result_status(tone_data)}]")
+        if on_result is not None:
+            on_result(index, tone_data)
+
+    if pool is not None:
+        for index, tone_data in enumerate(pool.imap(process_file, tasks, chunksize=CHUNK_SIZE)):
+            tone_list.append(tone_data)
+            report(index, tone_data)
+    elif workers > 1:
+        with Pool(processes=workers, initializer=init_worker, maxtasksperchild=MAX_TASKS_PER_CHILD) as pool:
+            for index, tone_data in enumerate(pool.imap(process_file, tasks, chunksize=CHUNK_SIZE)):
+                tone_list.append(tone_data)
+                report(index, tone_data)
+    else:
+        init_worker()
+        for index, task in enumerate(tasks):
+            tone_data = process_file(task)
+            tone_list.append(tone_data)
+            report(index, tone_data)
+
+    return tone_list
+
+
+def plan_corpus(store=None):
+    """
+    列出 PDF_DIR 中的文件，按内容哈希去重并 (可选) 去掉近似重复。
+    返回 (文件名列表, 待输出的条目, 需要实际解析的 {sha256: 文件路径})
+    """
+    files = sorted(f for f in os.listdir(PDF_DIR) if f.endswith('.pdf'))
+    entries, to_analyze = plan_files(files, store)
+    if NEAR_DUP_DETECTION:
+        entries, near_dups = drop_near_duplicates(entries)
+        kept_shas = {sha256 for *_, sha256 in entries}
+        to_analyze = {sha256: path for sha256, path in to_analyze.items() if sha256 in kept_shas}
+        if near_dups:
+            pd.DataFrame(near_dups).to_csv(NEAR_DUP_REPORT, index=False, encoding='utf-8-sig')
+            print(f"发现 {len(near_dups)} 份近似重复文件，明细已保存为: {NEAR_DUP_REPORT}")
+    return files, entries, to_analyze
+
+
+def export_queue(queue_db, version=None, output_file=OUTPUT_FILE):
+    """
+    把任务表中当前词典版本已完成的结果导出为 output_file，返回导出的行数。
+    与领取任务分开：导出可以随时重新运行，某个节点崩溃也不影响导出；仍有未完成的任务时导出已完成的部分并提示
+    """
+    if version is None:
+        init_jieba()
+        version = scoring_version()
+    queue = work_queue.WorkQueue(queue_db)
+    try:
+        progress = queue.progress(version)
+        df = queue.load_results(version)
+    finally:
+        queue.close()
+    if progress['pending'] or progress['leased'] or progress['error']:
+        print(f"提示：任务表中还有 {progress['pending']} 份待领取、{progress['leased']} 份处理中、"
+              f"{progress['error']} 份解析异常待重试，本次只导出已完成的部分")
+    if df.empty:
+        print("任务表中还没有有效结果，未导出。")
+        return 0
+    # 先写临时文件再改名，其他节点同时导出时不会读到半个文件
+    tmp_path = f"{output_file}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+    os.replace(tmp_path, output_file)
+    print(f"已从任务表导出 {len(df)} 条语调数据: {output_file}")
+    return len(df)
+
+
+def plan_queue(queue_db):
+    """
+    任务队列的规划步骤 (QUEUE_ROLE = 'plan')：列出文件、去重后写入任务表 (已有的任务保持原状，新下载的文件补入)，
+    本地结果库中已有确定结果的内容直接记为完成。只需在一个节点上运行，文件夹的哈希、近似重复指纹和
+    NEAR_DUP_REPORT 只计算和写入一次；各 worker 节点只领取任务。返回新写入的待解析任务数
+    """
+    init_jieba()
+    version = scoring_version()
+    queue = work_queue.WorkQueue(queue_db)
+    store = PdfStore() if USE_PDF_STORE and os.path.isdir(STORE_DIR) else None
+    _, entries, to_analyze = plan_corpus(store)
+    if store is not None:
+        store.close()
+    known = {}
+    if USE_TONE_STORE:
+        tone_store = ToneStore(TONE_DB)
+        known = tone_store.scored(version)
+        tone_store.close()
+    added = queue.enqueue(version, entries, to_analyze, known=known)
+    progress = queue.progress(version)
+    queue.close()
+    reused = sum(1 for sha256 in to_analyze if sha256 in known)
+    print(f"已写入任务表: 新增 {added} 份待解析内容 (共 {len(to_analyze)} 份内容、{len(entries)} 个文件，"
+          f"结果库已有 {reused} 份)；当前待领取 {progress['pending']} 份，"
+          f"多次失败已放弃 {progress['failed']} 份")
+    return added
+
+
+def run_queue(queue_db, worker_id=None):
+    """
+    任务队列的 worker (QUEUE_ROLE = 'worker'，见 work_queue.py)：不扫描文件夹，只反复领取一批文件解析，
+    每份结果立即提交到任务表并为本批剩余文件续租，直到没有可领取的任务。任务由 plan_queue 写入；
+    全部完成时顺带导出一次 OUTPUT_FILE，导出也可以单独运行 (QUEUE_ROLE = 'export'，见 export_queue)
+    """
+    worker_id = worker_id or work_queue.default_worker_id()
+    seconds, status = init_jieba()
+    print(f"jieba 词典就绪，用时 {seconds:.2f} 秒 ({status})")
+    version = scoring_version()
+
+    queue = work_queue.WorkQueue(queue_db)
+    if not any(queue.progress(version).values()):
+        queue.close()
+        print("任务表中没有当前词典版本的任务：请先在一个节点上以 QUEUE_ROLE = 'plan' 运行")
+        return
+
+    print(f"节点 {worker_id} 开始领取任务 (每批 {work_queue.BATCH_SIZE} 份，{WORKERS} 个进程)")
+    pool = Pool(processes=WORKERS, initializer=init_worker, maxtasksperchild=MAX_TASKS_PER_CHILD) \
+        if WORKERS > 1 else None
+    if pool is None:
+        init_worker()
+    processed = 0
+    try:
+        while True:
+            batch = queue.claim(worker_id, version)
+            if not batch:
+                break
+            tasks = [(os.path.join(PDF_DIR, file_name), sha256) for sha256, file_name in batch]
+            leased = {sha256 for _, sha256 in tasks}
+
+            def commit(index, tone_data):
+                sha256 = tasks[index][1]
+                leased.discard(sha256)
+                if not queue.complete(worker_id, version, sha256, tone_data, error=failure_reason(tone_data)):
+                    print(f"  [提示] {os.path.basename(tasks[index][0])} 已由其他节点完成 (本节点租约曾过期)")
+                # 批内每完成一份就为剩下的文件续租，慢文件不会让整批租约过期
+                queue.renew(worker_id, version, leased)
+
+            run_extraction(tasks, on_result=commit, pool=pool)
+            processed += len(tasks)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    progress = queue.progress(version)
+    queue.close()
+    print("\n" + "=" * 30)
+    print(f"节点 {worker_id} 结束，本节点解析 {processed} 份；任务表: 完成 {progress['done']}，"
+          f"处理中 {progress['leased']}，解析异常 {progress['error']} (下次规划时重试)，多次失败已放弃 {progress['failed']}")
+    if progress['pending'] == 0 and progress['leased'] == 0:
+        export_queue(queue_db, version)
+    else:
+        print("其他节点仍在处理；全部完成后可设置 QUEUE_ROLE = 'export' 在任意节点导出结果 CSV")
+    print("=" * 30)
+
+
+def export_dtm(entries, analyzed, directory):
+    """
+    把有效文档的分词结果保存为文档-词频矩阵 (分词结果优先读取 text_cache，不命中时重新解析)
+    """
+    paths = {sha256: os.path.join(PDF_DIR, filename) for filename, _, _, sha256 in entries}
+    shas = [sha256 for sha256 in paths if analyzed.get(sha256)]
+
+    def documents():
+        for sha256 in shas:
+            try:
+                # tokenize_pdf 惰性读取页面，在 try 内把词流读完，读到一半出错的文件整行记为 0
+                words, _ = tokenize_pdf(paths[sha256], sha256)
+                words = list(words)
+            except Exception as e:
+                print(f"  [读取失败] {os.path.basename(paths[sha256])}: {e}")
+                words = []
+            yield sha256, words
+
+    matrix, vocab = build_matrix(documents())
+    rows = {sha256: i for i, sha256 in enumerate(shas)}
+    docs = pd.DataFrame(
+        [{'StockCode': stock_code, 'Year': year, 'sha256': sha256, 'file_name': filename, 'Row': rows[sha256]}
+         for filename, stock_code, year, sha256 in entries if sha256 in rows],
+        columns=['StockCode', 'Year', 'sha256', 'file_name', 'Row']
+    )
+    save_matrix(directory, matrix, vocab, docs, {
+        'extractor': text_cache.extractor_key(PDF_BACKEND, PAGE_STRATEGY),
+        'tokenizer': text_cache.tokenizer_version(),
+    })
+    return matrix.shape
+
+
+# =================主程序=================
+if __name__ == "__main__":
+    if WORK_QUEUE_DB:
+        if QUEUE_ROLE == 'plan':
+            plan_queue(WORK_QUEUE_DB)
+        elif QUEUE_ROLE == 'export':
+            export_queue(WORK_QUEUE_DB)
+        else:
+            run_queue(WORK_QUEUE_DB)
+        exit()
+
+    results = []
+    store = PdfStore() if USE_PDF_STORE and os.path.isdir(STORE_DIR) else None
+
+    # 获取文件列表
+    files, entries, to_analyze = plan_corpus(store)
+
+    # 先在主进程中加载词典，进程池中的子进程 (fork) 直接继承
+    seconds, status = init_jieba()
+    print(f"jieba 词典就绪，用时 {seconds:.2f} 秒 ({status})")
+
+    # 结果库中当前版本已有结果的内容直接复用，只解析新文件
+    version = scoring_version()
+    tone_store = ToneStore(TONE_DB) if USE_TONE_STORE else None
+    scored = tone_store.scored(version) if tone_store is not None else {}
+    rows_by_sha = {}  # sha256 -> 该内容对应的 [(文件名, 代码, 年份, sha256)]
+    for entry in entries:
+        rows_by_sha.setdefault(entry[3], []).append(entry)
+    if tone_store is not None:
+        # 已解析过的内容换了文件名 (或新增了同内容的文件)：补写结果行，不重新解析
+        saved_keys = tone_store.scored_keys(version)
+        for sha256, rows in rows_by_sha.items():
+            missing = [row for row in rows if (row[1], row[2], sha256) not in saved_keys]
+            if sha256 in scored and missing:
+                tone_store.save(missing, version, scored[sha256])
+
+    pending = {sha256: file_path for sha256, file_path in to_analyze.items() if sha256 not in scored}
+    tasks = [(file_path, sha256) for sha256, file_path in pending.items()]
+    print(f"开始处理 {len(tasks)} 份 PDF 文件 (共 {len(files)} 个文件，{len(to_analyze) - len(tasks)} 份已有结果，"
+          f"{WORKERS} 个进程)，这可能需要一些时间...")
+
+    def commit(index, tone_data):
+        # 每份文件解析完立即写入结果库，中途崩溃时已完成的部分不会丢失
+        if tone_store is not None:
+            sha256 = tasks[index][1]
+            tone_store.save(rows_by_sha[sha256], version, tone_data, error=failure_reason(tone_data))
+
+    # 执行分析
+    tone_list = run_extraction(tasks, on_result=commit)
+    analyzed = {**scored, **dict(zip(pending.keys(), tone_list))}  # sha256 -> 语调结果
+
+    for filename, stock_code, year, sha256 in entries:
+        tone_data = analyzed[sha256]
         if tone_data:
             # 整理一行数据
             row = {
                 'StockCode': stock_code,
                 'Year': year,
+                'PublishDate': publish_date(filename),  # 同一年份有修订版时，合并面板按它保留最新的一份
                 **tone_data  # 展开字典
             }
             results.append(row)
-            print(" [完成]")
-        else:
-            print(" [内容为空或损坏]")
+    if tone_store is not None:
+        tone_store.close()
 
-    # 保存结果
+    # 保存结果 (与 ToneStore.export_csv 导出的当前版本结果相同)
     if results:
         df = pd.DataFrame(results)
         # 按照代码和年份排序
-        df.sort_values(by=['StockCode', 'Year'], inplace=True)
+        df.sort_values(by=['StockCode', 'Year', 'PublishDate'], inplace=True)
 
         df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
         print("\n" + "=" * 30)
@@ -142,5 +774,9 @@ if __name__ == "__main__":
         print(f"结果已保存为: {OUTPUT_FILE}")
         print("请打开这个 CSV 文件查看，这就是你的论文核心自变量 (X)！")
         print("=" * 30)
+
+        if DTM_DIR:
+            n_docs, n_words = export_dtm(entries, analyzed, DTM_DIR)
+            print(f"文档-词频矩阵 ({n_docs} 份文档 × {n_words} 个词) 已保存到: {DTM_DIR}/")
     else:
         print("未能提取到任何数据。")
\ No newline at end of file
@@ -1,40 +1,28 @@
 import pandas as pd
 import statsmodels.api as sm
 import os
+import io
 import numpy as np
 
+from panel_store import load_panel
+from preprocessing import Winsorizer
+
 # =================配置=================
 FILE_TONE = 'tone_results.csv'
 FILE_FINANCE = 'financial_data_real.csv'
+WINSOR_GROUP = None  # 缩尾分组：None 为全样本，'Year' 为逐年 (见 preprocessing.py)
 
 
 # =====================================
 
-def winsorize_series(series, limits=(0.01, 0.01)):
-    """
-    缩尾处理：把前1%和后1%的极端值，替换为边界值。
-    这是金融研究的标准动作，能极大提高结果显著性。
-    """
-    q_low = series.quantile(limits[0])
-    q_high = series.quantile(1 - limits[1])
-    return series.clip(lower=q_low, upper=q_high)
-
-
 def run_analysis():
     # 1. 读取
     if not os.path.exists(FILE_TONE) or not os.path.exists(FILE_FINANCE):
         print("文件缺失")
         return
 
-    df_tone = pd.read_csv(FILE_TONE)
-    df_fin = pd.read_csv(FILE_FINANCE)
-
-    # 格式统一
-    df_fin['StockCode'] = df_fin['StockCode'].astype(str).apply(lambda x: x.split('.')[-1])
-    df_tone['StockCode'] = df_tone['StockCode'].astype(str).str.zfill(6)
-
-    # 2. 合并
-    df_merge = pd.merge(df_fin, df_tone, on=['StockCode', 'Year'], how='inner')
+    # 2. 格式统一并合并 (见 panel_store.py)
+    df_merge = load_panel(FILE_TONE, FILE_FINANCE)
     print(f"原始匹配样本量: {len(df_merge)}")
 
     # 3. 数据清洗 (关键步骤！)
@@ -42,9 +30,9 @@ def run_analysis():
     reg_df = df_merge.dropna(subset=vars_list).copy()
 
     # === 缩尾处理 (Winsorization) ===
-    # 去除极值对回归的干扰
-    for col in vars_list:
-        reg_df[col] = winsorize_series(reg_df[col], limits=(0.01, 0.01))
+    # 把前1%和后1%的极端值替换为边界值，去除极值对回归的干扰 (金融研究的标准动作)。
+    # 全样本回归没有测试集，直接在全样本上计算边界；WINSOR_GROUP = 'Year' 时逐年缩尾
+    reg_df = Winsorizer(vars_list, limits=(0.01, 0.01), group_by=WINSOR_GROUP).fit_transform(reg_df)
 
     print(f"清洗后用于回归的样本量: {len(reg_df)}")
 
@@ -62,7 +50,8 @@ def run_analysis():
     # === 新增：自动保存结果到 Excel ===
     # 把回归结果的中间那部分（系数表）提取出来
     results_as_html = model.summary().tables[1].as_html()
-    df_results = pd.read_html(results_as_html, header=0, index_col=0)[0]
+    # 新版 pandas 不再接受 HTML 字符串本身 (会当作文件路径)，包装成 StringIO
+    df_results = pd.read_html(io.StringIO(results_as_html), header=0, index_col=0)[0]
 
     # 保存为 table2_results.csv
     df_results.to_csv('table2_results.csv', encoding='utf-8-sig')
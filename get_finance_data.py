@@ -1,99 +1,205 @@
 import baostock as bs
 import pandas as pd
 import os
+import json
 import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
 
 # =================配置区域=================
 INPUT_CSV = 'annual_report_links_full.csv'  # 读取您已有的股票代码
 OUTPUT_FILE = 'financial_data_real.csv'
+ERROR_REPORT = 'financial_data_errors.csv'  # 每只股票 / 每张表的失败明细
+
+# 抓取模式：'process' 为多进程并行 (每个进程单独登录 Baostock)；'serial' 为单进程逐个抓取
+FETCH_MODE = 'process'
+MAX_WORKERS = 8
+
+# 原始查询结果的本地缓存：按 (代码, 年份, 季度, 表名) 存为 JSON，重跑或新增字段时直接命中
+CACHE_DIR = 'baostock_cache'
+YEARS = range(2015, 2024)  # 2015-2023
+QUARTER = 4  # quarter=4 代表年报
+
+# 表名 -> Baostock 查询函数；新增字段 (如现金流、杜邦分析) 时在这里加一行即可
+QUERY_FUNCS = {
+    'profit': bs.query_profit_data,  # 盈利能力 (包含 ROE)
+    'balance': bs.query_balance_data,  # 偿债能力 (包含 资产负债率)
+    'growth': bs.query_growth_data,  # 成长能力 (包含 营收增长率)
+}
 
 
 # =========================================
 
-def get_real_finance_baostock():
-    # 1. 登录系统
-    lg = bs.login()
-    print(f"Baostock 登录状态: {lg.error_msg}")
+_logged_in = False
+
+
+def ensure_login():
+    """
+    当前进程第一次真正需要访问 API 时才登录；全部命中缓存的重跑不会登录
+    """
+    global _logged_in
+    if not _logged_in:
+        lg = bs.login()
+        if lg.error_code != '0':
+            raise RuntimeError(f"Baostock 登录失败: {lg.error_msg}")
+        _logged_in = True
+        # 进程退出时登出。进程池的工作进程结束时不执行 atexit，但会执行 multiprocessing 的终结器，
+        # 所以用 Finalize 注册：单进程模式下主进程退出时、多进程模式下每个工作进程退出时各自登出
+        util.Finalize(None, bs.logout, exitpriority=10)
+
+
+def to_bs_code(code):
+    """
+    格式转换：Baostock 需要 "sh.600000" 或 "sz.000001" 的格式
+    """
+    str_code = str(code).zfill(6)
+    if str_code.startswith('6'):
+        return str_code, f"sh.{str_code}"
+    return str_code, f"sz.{str_code}"
+
+
+def cache_path(bs_code, year, quarter, table):
+    return os.path.join(CACHE_DIR, table, f"{bs_code}_{year}_Q{quarter}.json")
+
+
+def query_table(bs_code, year, quarter, table):
+    """
+    查询一张表的原始行数据 (字符串列表的列表)，优先读本地缓存。
+    只缓存查询成功的结果 (包括合法的空结果)，查询失败时抛出异常。
+    """
+    path = cache_path(bs_code, year, quarter, table)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['rows']
+
+    ensure_login()
+    rs = QUERY_FUNCS[table](code=bs_code, year=year, quarter=quarter)
+    if rs.error_code != '0':
+        raise RuntimeError(f"{rs.error_code} {rs.error_msg}")
+    rows = []
+    while rs.next():
+        rows.append(rs.get_row_data())
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'fields': rs.fields, 'rows': rows}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return rows
+
+
+def build_record(str_code, year, data_profit, data_balance, data_growth):
+    """
+    由三张表的原始行拼出一条年度财务数据，ROE 为空时返回 None
+    """
+    # Baostock 返回的字段索引需要查文档，这里我已经为您查好了：
+    # Profit: [0:code, 1:pubDate, 2:statDate, 3:roeAvg, 4:npMargin, 5:gpMargin, 6:netProfit, 7:epsTTM, 8:MBRevenue, 9:totalShare, 10:liqaShare]
+    # 我们主要需要 ROE(3)
+
+    # 注意：Baostock 的 ROA 不在 profit 里，通常用 ROE 替代或自己计算
+    # 这里我们先抓取核心的 ROE 和 资产负债率
+
+    # 提取数据 (Baostock 返回的是字符串列表)
+    # 盈利表字段：roeAvg 是第 3 列 (索引从0开始)
+    roe = data_profit[3]
+
+    # 偿债表字段：liabToAsset (资产负债率) 是第 5 列
+    leverage = data_balance[5] if len(data_balance) > 5 else None
+
+    # 成长表字段：YOY_OR (营收增长率) 是第 5 列
+    growth = data_growth[5] if len(data_growth) > 5 else None
+
+    # 如果数据有效
+    if roe == "":
+        return None
+    return {
+        'StockCode': str_code,
+        'Year': year,
+        'ROE': float(roe) if roe else None,
+        'Leverage': float(leverage) if leverage else None,
+        'Growth': float(growth) if growth else None,
+        # Baostock 默认没有直接的 ROA 字段，我们可以用 ROE * (1-Leverage) 粗略估算，或者后续用 CSMAR 补全
+        # 为了跑通回归，暂且用 ROE 替代 ROA 的位置，或者只分析 ROE
+        'ROA': float(roe) * 0.5  # 仅作为占位，避免空值报错，真实分析建议下载 CSMAR
+    }
+
+
+def fetch_stock(code):
+    """
+    抓取一只股票 2015-2023 年的财务数据 (进程池的任务函数)。
+    返回 (数据行列表, 错误列表)，单次失败记入错误列表而不是静默忽略。
+    """
+    str_code, bs_code = to_bs_code(code)
+    records = []
+    errors = []
+
+    for year in YEARS:
+        tables = {}
+        for table in QUERY_FUNCS:
+            try:
+                rows = query_table(bs_code, year, QUARTER, table)
+                tables[table] = rows[0] if rows else []
+            except Exception as e:
+                errors.append({'StockCode': str_code, 'Year': year, 'Table': table, 'Error': str(e)})
+
+        if not tables.get('profit'):
+            continue
+        try:
+            record = build_record(str_code, year, tables['profit'], tables.get('balance', []), tables.get('growth', []))
+        except Exception as e:
+            errors.append({'StockCode': str_code, 'Year': year, 'Table': 'parse', 'Error': str(e)})
+            continue
+        if record:
+            records.append(record)
+
+    return records, errors
+
 
+def get_real_finance_baostock():
     if not os.path.exists(INPUT_CSV):
         print(f"错误：找不到 {INPUT_CSV}")
         return
 
-    # 2. 读取股票列表
+    # 1. 读取股票列表
     df_links = pd.read_csv(INPUT_CSV)
-    raw_codes = df_links['StockCode'].unique()
+    raw_codes = list(df_links['StockCode'].unique())
 
     print(f"准备抓取 {len(raw_codes)} 家公司的真实年报数据...")
+    start = time.time()
 
     all_data = []
-
-    # 3. 循环获取数据
-    for i, code in enumerate(raw_codes):
-        # 格式转换：Baostock 需要 "sh.600000" 或 "sz.000001" 的格式
-        str_code = str(code).zfill(6)
-        if str_code.startswith('6'):
-            bs_code = f"sh.{str_code}"
-        else:
-            bs_code = f"sz.{str_code}"
-
-        # 打印进度
-        if (i + 1) % 50 == 0:
-            print(f"进度 [{i + 1}/{len(raw_codes)}] ...")
-
-        for year in range(2015, 2024):  # 2015-2023
-            try:
-                # query_profit_data: 查询盈利能力 (包含 ROE, ROA)
-                # quarter=4 代表年报
-                rs = bs.query_profit_data(code=bs_code, year=year, quarter=4)
-
-                # query_balance_data: 查询偿债能力 (包含 资产负债率)
-                rs_balance = bs.query_balance_data(code=bs_code, year=year, quarter=4)
-
-                # query_growth_data: 查询成长能力 (包含 营收增长率)
-                rs_growth = bs.query_growth_data(code=bs_code, year=year, quarter=4)
-
-                if rs.error_code == '0' and rs.next():
-                    # 解析数据
-                    data_profit = rs.get_row_data()
-                    data_balance = rs_balance.get_row_data() if rs_balance.next() else []
-                    data_growth = rs_growth.get_row_data() if rs_growth.next() else []
-
-                    # Baostock 返回的字段索引需要查文档，这里我已经为您查好了：
-                    # Profit: [0:code, 1:pubDate, 2:statDate, 3:roeAvg, 4:npMargin, 5:gpMargin, 6:netProfit, 7:epsTTM, 8:MBRevenue, 9:totalShare, 10:liqaShare]
-                    # 我们主要需要 ROE(3)
-
-                    # 注意：Baostock 的 ROA 不在 profit 里，通常用 ROE 替代或自己计算
-                    # 这里我们先抓取核心的 ROE 和 资产负债率
-
-                    # 提取数据 (Baostock 返回的是字符串列表)
-                    # 盈利表字段：roeAvg 是第 3 列 (索引从0开始)
-                    roe = data_profit[3]
-
-                    # 偿债表字段：liabToAsset (资产负债率) 是第 5 列
-                    leverage = data_balance[5] if len(data_balance) > 5 else None
-
-                    # 成长表字段：YOY_OR (营收增长率) 是第 5 列
-                    growth = data_growth[5] if len(data_growth) > 5 else None
-
-                    # 如果数据有效
-                    if roe != "":
-                        all_data.append({
-                            'StockCode': str_code,
-                            'Year': year,
-                            'ROE': float(roe) if roe else None,
-                            'Leverage': float(leverage) if leverage else None,
-                            'Growth': float(growth) if growth else None,
-                            # Baostock 默认没有直接的 ROA 字段，我们可以用 ROE * (1-Leverage) 粗略估算，或者后续用 CSMAR 补全
-                            # 为了跑通回归，暂且用 ROE 替代 ROA 的位置，或者只分析 ROE
-                            'ROA': float(roe) * 0.5  # 仅作为占位，避免空值报错，真实分析建议下载 CSMAR
-                        })
-            except Exception as e:
-                pass  # 忽略单次错误
-
-    # 4. 登出
-    bs.logout()
-
-    # 5. 保存
+    all_errors = []
+
+    # 2. 获取数据 (两种模式结果顺序一致，都按股票列表顺序)
+    if FETCH_MODE == 'process':
+        print(f"多进程模式：{MAX_WORKERS} 个进程，每个进程单独登录 Baostock")
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            outputs = executor.map(fetch_stock, raw_codes, chunksize=4)
+            for i, (records, errors) in enumerate(outputs):
+                all_data.extend(records)
+                all_errors.extend(errors)
+                # 打印进度
+                if (i + 1) % 50 == 0:
+                    print(f"进度 [{i + 1}/{len(raw_codes)}] ...")
+    else:
+        for i, code in enumerate(raw_codes):
+            records, errors = fetch_stock(code)
+            all_data.extend(records)
+            all_errors.extend(errors)
+            if (i + 1) % 50 == 0:
+                print(f"进度 [{i + 1}/{len(raw_codes)}] ...")
+
+    print(f"抓取耗时 {time.time() - start:.1f} 秒")
+
+    # 3. 错误报告 (本次没有失败时删除上次留下的报告，避免误以为仍有失败)
+    if all_errors:
+        pd.DataFrame(all_errors).to_csv(ERROR_REPORT, index=False, encoding='utf-8-sig')
+        failed_stocks = len({e['StockCode'] for e in all_errors})
+        print(f"注意：{failed_stocks} 只股票共 {len(all_errors)} 次查询失败，明细见 {ERROR_REPORT}")
+    elif os.path.exists(ERROR_REPORT):
+        os.remove(ERROR_REPORT)
+
+    # 4. 保存
     if all_data:
         df = pd.DataFrame(all_data)
         # 剔除空值
@@ -109,4 +215,4 @@ def get_real_finance_baostock():
 
 
 if __name__ == "__main__":
-    get_real_finance_baostock()
\ No newline at end of file
+    get_real_finance_baostock()
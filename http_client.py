@@ -0,0 +1,157 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# =================配置区域=================
+# 所有爬虫脚本共用的请求头 (各脚本可在调用时覆盖 / 追加)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+DEFAULT_TIMEOUT = (5, 30)  # (连接超时, 读取超时) 秒
+POOL_SIZE = 16  # 每个主机保持的长连接数上限 (www / static 两个域名各一组)
+
+MAX_RETRIES = 4  # 5xx / 超时 / 连接错误的最大重试次数
+BACKOFF_BASE = 1.0  # 指数退避的基准秒数：第 n 次重试最多等待 BACKOFF_BASE * 2^n 秒
+BACKOFF_CAP = 30.0  # 单次退避的上限秒数
+
+# 熔断：连续 BREAKER_THRESHOLD 次失败或被限流后，所有线程 / 协程暂停 BREAKER_COOLDOWN 秒
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60.0
+BREAKER_MAX_COOLDOWN = 600.0
+THROTTLE_STATUS = {403, 429, 503}  # 巨潮限流 / 封禁时常见的状态码
+
+
+# =========================================
+
+def backoff_delay(attempt):
+    """
+    带抖动的指数退避 (full jitter)：在 [0, min(上限, 基准 * 2^attempt)] 之间随机取值，
+    避免所有线程在同一时刻一起重试
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def is_retryable_status(status_code):
+    return status_code >= 500 or status_code in THROTTLE_STATUS
+
+
+class CircuitBreaker:
+    """
+    全局熔断器：所有线程 / 协程共享。
+    连续失败达到阈值即"断开"，在冷却期内所有请求都先等待；
+    冷却后放行试探请求，成功则恢复，仍失败则冷却时间翻倍。
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        """
+        距离熔断恢复还需等待的秒数，未熔断时为 0
+        """
+        return max(0.0, self.open_until - time.monotonic())
+
+    def wait(self):
+        delay = self.remaining()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self.remaining()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+
+    def record_failure(self, throttled=False):
+        """
+        记录一次失败；被限流 (throttled) 时直接熔断，不必等连续失败累积
+        """
+        with self.lock:
+            self.failures += 1
+            if not throttled and self.failures < self.threshold:
+                return
+            if self.remaining() > 0:
+                return  # 已处于熔断中，其他线程已经触发过
+            self.open_until = time.monotonic() + self.cooldown
+            print(f"\n[熔断] 连续失败 {self.failures} 次 (限流: {throttled})，全部请求暂停 {self.cooldown:.0f} 秒...")
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+
+
+# 全局共享的熔断器
+BREAKER = CircuitBreaker()
+
+# 每个线程一个 Session：线程内复用长连接，线程之间互不干扰
+_local = threading.local()
+
+
+def get_session():
+    """
+    返回当前线程的 requests.Session (带连接池与 keep-alive)
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        # 重试由 request() 自己控制，连接池层不再重试
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+
+def request(method, url, max_retries=MAX_RETRIES, breaker=BREAKER, **kwargs):
+    """
+    发送请求：复用长连接，5xx / 限流状态码 / 超时 / 连接错误时按抖动指数退避重试，
+    并把结果报告给全局熔断器。
+    重试耗尽后返回最后一次的响应，或抛出最后一次的异常。
+    """
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    session = get_session()
+
+    for attempt in range(max_retries + 1):
+        breaker.wait()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            breaker.record_failure()
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"\n[重试 {attempt + 1}/{max_retries}] {url} 请求异常: {e}，{delay:.1f} 秒后重试")
+            time.sleep(delay)
+            continue
+
+        if not is_retryable_status(response.status_code):
+            breaker.record_success()
+            return response
+
+        breaker.record_failure(throttled=response.status_code in THROTTLE_STATUS)
+        if attempt == max_retries:
+            return response
+        response.close()
+        delay = backoff_delay(attempt)
+        print(f"\n[重试 {attempt + 1}/{max_retries}] {url} 状态码 {response.status_code}，{delay:.1f} 秒后重试")
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
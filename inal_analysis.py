@@ -1,7 +1,8 @@
-import pandas as pd
 import statsmodels.api as sm
 import os
 
+from panel_store import load_panel
+
 # =================配置区域=================
 FILE_TONE = 'tone_results.csv'  # X: 你的语调数据
 FILE_FINANCE = 'financial_data_real.csv'  # Y: 你的财务数据 (Baostock版)
@@ -16,18 +17,10 @@ def run_analysis():
         return
 
     print("正在读取数据...")
-    df_tone = pd.read_csv(FILE_TONE)
-    df_fin = pd.read_csv(FILE_FINANCE)
-
-    # 2. 关键：统一股票代码格式
-    # 语调数据可能是 "000001"，财务数据可能是 "sz.000001"
-    # 我们统一只保留 6 位数字
-    df_fin['StockCode'] = df_fin['StockCode'].astype(str).apply(lambda x: x.split('.')[-1])
-    df_tone['StockCode'] = df_tone['StockCode'].astype(str).str.zfill(6)
-
-    # 3. 数据合并 (Merge)
-    # 只有当 "股票代码" 和 "年份" 都对得上时，才拼在一起
-    df_merge = pd.merge(df_fin, df_tone, on=['StockCode', 'Year'], how='inner')
+    # 2-3. 统一股票代码格式并合并 (见 panel_store.py)：
+    # 语调数据可能是 "000001"，财务数据可能是 "sz.000001"，统一只保留 6 位数字；
+    # 只有当 "股票代码" 和 "年份" 都对得上时，才拼在一起。源文件没变时直接读取缓存的面板
+    df_merge = load_panel(FILE_TONE, FILE_FINANCE)
 
     print(f"\n【合并成功】最终有效样本量: {len(df_merge)} 条")
 
@@ -0,0 +1,149 @@
+import os
+import time
+import pickle
+import hashlib
+
+import jieba
+
+# =================配置区域=================
+# 项目维护的金融词典 (jieba 用户词典格式：每行 "词 [词频] [词性]"，# 开头为注释)
+USER_DICT_FILE = 'finance_userdict.txt'
+# 合并后的主词典 (jieba 默认词典 + 金融词典 + 情感词典词条) 及其序列化缓存所在目录
+DICT_DIR = 'jieba_dict'
+
+
+# =========================================
+# jieba 默认在第一次分词时才读取 35 万行的词典构建前缀词典，用户词典还要再逐词 add_word。
+# 这里把三部分预先合并成一个主词典文件，并把构建好的前缀词典序列化：
+# - 第一次运行：生成合并词典 finance-<签名>.txt 和前缀词典缓存 finance-<签名>.pkl；
+# - 之后每个进程只需加载缓存 (pickle 比 jieba 自带的 marshal 缓存快约 3 倍)；
+#   主进程先初始化再创建进程池时，fork 出的子进程直接继承，几乎没有开销。
+# 签名由 jieba 版本、金融词典内容和情感词典词条决定，任一变化都会生成新的词典和缓存，
+# text_cache 的分词缓存也随之失效。
+
+_signature = None
+
+
+def dictionary_signature():
+    """
+    当前进程启用的词典签名；未调用 setup() 时为 'default'
+    """
+    return _signature or 'default'
+
+
+def read_user_dict(path):
+    """
+    读取用户词典，返回 [(词, 词频或 None, 词性或 None)]
+    """
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.split('#', 1)[0].split()
+            if not parts:
+                continue
+            freq = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
+            tag = parts[-1] if len(parts) > 1 and not parts[-1].isdigit() else None
+            entries.append((parts[0], freq, tag))
+    return entries
+
+
+def filter_entries(entries, terms):
+    """
+    去掉包含情感词条的金融词 (如 "同比增长" 会把 "增长" 吞掉，导致正面词计数偏低)
+    """
+    kept = []
+    for word, freq, tag in entries:
+        hidden = [term for term in terms if term != word and term in word]
+        if hidden:
+            print(f"  [词典] 跳过 {word}：包含情感词 {', '.join(sorted(hidden))}")
+            continue
+        kept.append((word, freq, tag))
+    return kept
+
+
+def build_signature(entries, terms):
+    digest = hashlib.sha1(jieba.__version__.encode())
+    for word, freq, tag in sorted(entries, key=lambda e: e[0]):
+        digest.update(f"{word} {freq} {tag}\n".encode('utf-8'))
+    digest.update(b'--terms--\n')
+    for term in sorted(terms):
+        digest.update(f"{term}\n".encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def build_dictionary(path, entries, terms):
+    """
+    生成合并后的主词典：默认词典原样保留，新词的词频取 jieba.suggest_freq 给出的、
+    刚好能让它整体切出的值 (已有的词取两者较大值)，写完后原子改名
+    """
+    base = jieba.Tokenizer()
+    base.initialize()
+
+    lines = {}
+    with base.get_dict_file() as f:
+        for raw in f:
+            parts = raw.decode('utf-8').strip().split(' ')
+            if len(parts) >= 2:
+                lines[parts[0]] = [int(parts[1]), parts[2] if len(parts) > 2 else None]
+
+    for word, freq, tag in list(entries) + [(term, None, None) for term in sorted(terms)]:
+        if freq is None:
+            freq = base.suggest_freq(word, False)
+        if word in lines:
+            lines[word][0] = max(lines[word][0], freq)
+            lines[word][1] = lines[word][1] or tag
+        else:
+            lines[word] = [freq, tag]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for word, (freq, tag) in lines.items():
+            f.write(f"{word} {freq} {tag}\n" if tag else f"{word} {freq}\n")
+    os.replace(tmp_path, path)
+
+
+def setup(terms=(), user_dict=USER_DICT_FILE):
+    """
+    在当前进程启用金融词典，terms 为需要保持整体切分的情感词条。
+    返回 (耗时秒数, 状态)：'ready' 本进程已初始化 / 'cache' 加载序列化缓存 / 'built' 新生成词典
+    """
+    global _signature
+    start = time.perf_counter()
+    terms = set(terms)
+    entries = read_user_dict(user_dict) if user_dict and os.path.exists(user_dict) else []
+    entries = filter_entries(entries, terms)
+    signature = build_signature(entries, terms)
+
+    dict_path = os.path.abspath(os.path.join(DICT_DIR, f"finance-{signature}.txt"))
+    if jieba.dt.initialized and jieba.dt.dictionary == dict_path:
+        _signature = signature
+        return time.perf_counter() - start, 'ready'
+
+    cache_path = os.path.join(DICT_DIR, f"finance-{signature}.pkl")
+    prefix_dict, status = None, 'cache'
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                prefix_dict = pickle.load(f)
+        except Exception:
+            prefix_dict = None  # 缓存损坏时重新构建
+
+    if prefix_dict is None:
+        status = 'built'
+        if not os.path.exists(dict_path):
+            build_dictionary(dict_path, entries, terms)
+        tokenizer = jieba.Tokenizer(dict_path)
+        prefix_dict = tokenizer.gen_pfdict(tokenizer.get_dict_file())
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(prefix_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    # 直接装入默认分词器，等价于 jieba.set_dictionary() + jieba.initialize()
+    with jieba.dt.lock:
+        jieba.dt.dictionary = dict_path
+        jieba.dt.FREQ, jieba.dt.total = prefix_dict
+        jieba.dt.initialized = True
+    _signature = signature
+    return time.perf_counter() - start, status
@@ -0,0 +1,131 @@
+import re
+from collections import Counter
+from itertools import islice
+
+import pandas as pd
+
+# =========================================
+# 编译后的情感词典：一次遍历分词结果即可得到所有类别的计数。
+# - 词 -> 类别位掩码 的查找表：每个词条可以属于多个类别，例如"风险"同时计入负面和不确定，
+#   这是词典中显式声明的，而不是两个集合碰巧重叠；
+# - 遍历时只用 C 实现的 Counter 统计词频，再按词典查表汇总，类别再多也只遍历一次；
+# - 被 jieba 切成多个词的词条 (如"或将" -> "或" + "将") 作为短语登记，
+#   按最长匹配计数，匹配上短语后其中的单词不再重复计数。
+
+CHUNK_TOKENS = 65536  # 流式处理时每批的词数
+
+
+class CompiledLexicon:
+    """
+    把 {类别名: 词条集合} 编译成查找表，count() 一次遍历返回所有类别的计数
+    """
+
+    def __init__(self, categories, tokenize=None):
+        """
+        categories: {类别名: 可迭代的词条}，类别的顺序即输出的顺序
+        tokenize: 把词条切成词序列的函数 (应与正文分词一致，通常为 jieba.lcut)；
+                  为 None 时每个词条只按整词匹配
+        """
+        self.names = list(categories)
+        self.masks = {}  # 整词 -> 类别掩码
+        phrase_masks = {}  # "词 词" -> 类别掩码
+        for bit, name in enumerate(self.names):
+            for term in categories[name]:
+                # 正文中的词条可能是一个整词，也可能被切开，两种形式都登记
+                self.masks[term] = self.masks.get(term, 0) | (1 << bit)
+                if tokenize is not None:
+                    parts = [part for part in tokenize(term) if part.strip()]
+                    if len(parts) > 1:
+                        key = ' '.join(parts)
+                        phrase_masks[key] = phrase_masks.get(key, 0) | (1 << bit)
+
+        self.phrases = phrase_masks
+        self.max_phrase_len = max((key.count(' ') + 1 for key in phrase_masks), default=1)
+        self.phrase_re = None
+        if phrase_masks:
+            # 词之间用空格连接后做正则匹配；长短语排在前面，实现最长匹配
+            alternatives = sorted(phrase_masks, key=len, reverse=True)
+            self.phrase_re = re.compile(
+                r'(?<![^ ])(?:' + '|'.join(re.escape(p) for p in alternatives) + r')(?![^ ])'
+            )
+
+    def overlaps(self):
+        """
+        返回同时属于多个类别的词条 {词条: [类别名, ...]}，便于检查交叉计数是否符合设计
+        """
+        return {
+            term: self._bits_to_names(mask)
+            for term, mask in self.masks.items() if mask & (mask - 1)
+        }
+
+    def _bits_to_names(self, mask):
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+    def _add(self, counts, mask, n):
+        bit = 0
+        while mask:
+            if mask & 1:
+                counts[bit] += n
+            mask >>= 1
+            bit += 1
+
+    def count(self, tokens):
+        """
+        单次遍历词序列 (列表或任意迭代器，词中不含空格)，返回 (各类别计数列表, 总词数)。
+        按批读取，内存只与批大小有关。
+        """
+        counts = [0] * len(self.names)
+        freq = Counter()
+        phrase_hits = Counter()
+        carry = []  # 上一批末尾的几个词，用于匹配跨批的短语
+        total = 0
+        iterator = iter(tokens)
+
+        while True:
+            chunk = list(islice(iterator, CHUNK_TOKENS))
+            if not chunk:
+                break
+            total += len(chunk)
+            freq.update(chunk)
+
+            if self.phrase_re is not None:
+                # 完全落在上一批里的短语已经计过，只统计结束位置在本批中的
+                boundary = sum(len(token) + 1 for token in carry)
+                for match in self.phrase_re.finditer(' '.join(carry + chunk)):
+                    if match.end() > boundary:
+                        phrase_hits[match.group()] += 1
+                carry = (carry + chunk)[-(self.max_phrase_len - 1):]
+
+        # 整词计数：遍历词典和词频表中较小的一个
+        if len(self.masks) <= len(freq):
+            for term, mask in self.masks.items():
+                n = freq.get(term)
+                if n:
+                    self._add(counts, mask, n)
+        else:
+            for token, n in freq.items():
+                mask = self.masks.get(token)
+                if mask:
+                    self._add(counts, mask, n)
+
+        # 短语计数：加上短语的类别，并扣掉组成它的单词已经计入的部分
+        for phrase, n in phrase_hits.items():
+            self._add(counts, self.phrases[phrase], n)
+            for part in phrase.split(' '):
+                mask = self.masks.get(part)
+                if mask:
+                    self._add(counts, mask, -n)
+
+        return counts, total
+
+
+def load_lexicon_file(path):
+    """
+    从 CSV 读取大规模词典 (两列: term, category；同一词条可出现在多行以属于多个类别)，
+    返回 {类别名: 词条集合}
+    """
+    df = pd.read_csv(path, dtype=str).dropna(subset=['term', 'category'])
+    categories = {}
+    for term, category in zip(df['term'].str.strip(), df['category'].str.strip()):
+        categories.setdefault(category, set()).add(term)
+    return categories
@@ -0,0 +1,111 @@
+import re
+
+# =================配置区域=================
+# 按优先级查找的章节标题：2015 年以后的年报一般为"管理层讨论与分析"，
+# 更早的格式把它放在"董事会报告"一节里。只想要前者时删掉第二项即可。
+SECTION_TITLES = ['管理层讨论与分析', '董事会报告']
+TOC_SCAN_PAGES = 6  # 在前几页中寻找目录页
+OFFSET_SEARCH = 12  # 目录页码与 PDF 实际页序之间允许的最大偏移 (封面、扉页等不计页码)
+MAX_SECTION_PAGES = 120  # 定位出的章节超过这个页数时视为识别错误
+
+
+# =========================================
+
+# 目录条目："第三节 管理层讨论与分析 ........ 10"。不依赖换行：pdfminer 等后端取出的目录页文本没有换行，
+# 各条目首尾相连 ("...8第四节 公司治理....15")，因此在整页文本中逐个查找 "标题 + 引导符 + 页码"。
+# 标题不含数字 ("第3节" 这类序号除外) 和句中标点，页码之后不能紧跟数字，正文段落不会被当成目录条目
+TOC_ENTRY = re.compile(
+    r'((?:第\s*\d{1,2}\s*[节章部分]+\s*)?[^\d\s\.·…．\-—_，。；：！？,;:!?][^\d\.·…．\-—_，。；：！？,;:!?]{0,60}?)'
+    r'[\s\.·…．\-—_]+(\d{1,4})(?!\d)'
+)
+
+
+def normalize_title(text):
+    """
+    去掉空白，避免 "管理层讨论 与分析"、"目  录" 这类排版空格影响匹配
+    """
+    return re.sub(r'\s+', '', text or '')
+
+
+def section_from_outline(outline, total_pages):
+    """
+    用书签定位章节：找到标题匹配的书签，结束页为其后第一个同级或更高级书签的起始页。
+    outline 为 [(层级, 标题, 页序)]，页序从 0 开始；返回 (起始页, 结束页(不含), 标题) 或 None
+    """
+    entries = sorted(enumerate(outline), key=lambda x: (x[1][2], x[0]))
+    entries = [entry for _, entry in entries]
+    for keyword in SECTION_TITLES:
+        for k, (level, title, page) in enumerate(entries):
+            if keyword not in normalize_title(title):
+                continue
+            end = total_pages
+            for next_level, _, next_page in entries[k + 1:]:
+                if next_level <= level and next_page > page:
+                    end = next_page
+                    break
+            return page, end, keyword
+    return None
+
+
+def parse_toc(text):
+    """
+    解析目录页文本，返回 [(标题, 印刷页码)]
+    """
+    return [(normalize_title(match.group(1)), int(match.group(2))) for match in TOC_ENTRY.finditer(text or '')]
+
+
+def _offset_candidates():
+    yield 0
+    for step in range(1, OFFSET_SEARCH + 1):
+        yield step
+        yield -step
+
+
+def section_from_toc(pdf, total_pages):
+    """
+    没有书签时扫描目录页：按印刷页码找到章节，再在附近几页中寻找章节标题，
+    校准印刷页码与 PDF 页序之间的偏移。返回 (起始页, 结束页(不含), 标题) 或 None
+    """
+    toc_index, entries = None, []
+    for i in range(min(TOC_SCAN_PAGES, total_pages)):
+        text = pdf.page_text(i)
+        if '目录' in normalize_title(text):
+            toc_index, entries = i, parse_toc(text)
+            break
+    if not entries:
+        return None
+
+    for keyword in SECTION_TITLES:
+        for k, (title, printed_start) in enumerate(entries):
+            if keyword not in title:
+                continue
+            printed_end = next((page for _, page in entries[k + 1:] if page > printed_start), None)
+
+            for offset in _offset_candidates():
+                start = printed_start - 1 + offset
+                if start <= toc_index or start >= total_pages:
+                    continue
+                if keyword in normalize_title(pdf.page_text(start)):
+                    end = printed_end - 1 + offset if printed_end else total_pages
+                    return start, max(start + 1, min(end, total_pages)), keyword
+            break
+    return None
+
+
+def locate_section(pdf):
+    """
+    定位管理层讨论与分析所在的页面范围：先用 PDF 书签，再退回扫描目录页。
+    pdf 为 pdf_backends 中的后端实例；
+    返回 {'start', 'end' (不含), 'source' ('outline' / 'toc'), 'title'}，找不到时返回 None
+    """
+    total_pages = pdf.page_count()
+    for source, locate in (('outline', lambda: section_from_outline(pdf.outline(), total_pages)),
+                           ('toc', lambda: section_from_toc(pdf, total_pages))):
+        try:
+            found = locate()
+        except Exception:
+            found = None
+        if found and 0 < found[1] - found[0] <= MAX_SECTION_PAGES:
+            start, end, title = found
+            return {'start': start, 'end': end, 'source': source, 'title': title}
+    return None
@@ -1,16 +1,28 @@
 import pandas as pd
-import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+import rolling_eval
+from model_cache import ModelCache
+from model_zoo import MODEL_WORKERS, check_model_names, run_models
+from panel_store import load_panel
+from preprocessing import Winsorizer
+
 # =================配置区域=================
 FILE_TONE = 'tone_results.csv'
 FILE_FINANCE = 'financial_data_real.csv'
+WINSOR_GROUP = None  # 缩尾分组：None 为全样本，'Year' 为逐年 (见 preprocessing.py)
+WINSOR_BOUNDS_FILE = 'winsor_bounds.json'  # 训练集上拟合的缩尾边界，新数据可直接 Winsorizer.load 后 transform
+# 参与比较的模型 (名称见 model_zoo.MODELS)；None 为注册表中的全部模型。不含 'Random Forest' 时不画特征重要性图
+MODELS_TO_RUN = ['OLS Regression (Baseline)', 'Random Forest', 'Gradient Boosting', 'Hist Gradient Boosting']
+# 按年份的滚动起点样本外评估 (见 rolling_eval.py)：用 ≤ t 年训练、预测 t+1 年，结果保存为 Table 4
+ROLLING_EVALUATION = True
+# 训练结果缓存 (见 model_cache.py)：数据、特征、缩尾边界和超参数都没变时直接读取训练好的模型，
+# 重新出表、重画特征重要性图不必再训练；False 为每次都重新训练
+USE_MODEL_CACHE = True
+MODEL_CACHE_DIR = 'model_cache'
 # =========================================
 
 # 解决画图中文乱码
@@ -18,74 +30,37 @@ plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
 
 
-def winsorize_series(series, limits=(0.01, 0.01)):
-    q_low = series.quantile(limits[0])
-    q_high = series.quantile(1 - limits[1])
-    return series.clip(lower=q_low, upper=q_high)
-
-
 def run_ml_analysis():
+    # 先检查模型名称，拼错时立即报错，而不是训练完才发现
+    model_names = check_model_names(MODELS_TO_RUN)
+
     # 1. 读取数据
     if not os.path.exists(FILE_TONE) or not os.path.exists(FILE_FINANCE):
         print("错误：数据文件缺失")
         return
 
-    df_tone = pd.read_csv(FILE_TONE)
-    df_fin = pd.read_csv(FILE_FINANCE)
-
-    # 格式统一
-    df_fin['StockCode'] = df_fin['StockCode'].astype(str).apply(lambda x: x.split('.')[-1])
-    df_tone['StockCode'] = df_tone['StockCode'].astype(str).str.zfill(6)
-
-    df_merge = pd.merge(df_fin, df_tone, on=['StockCode', 'Year'], how='inner')
+    # 格式统一并合并 (见 panel_store.py)
+    df_merge = load_panel(FILE_TONE, FILE_FINANCE)
 
     # 2. 数据准备
     vars_list = ['ROE', 'Positive_Tone', 'Negative_Tone', 'Leverage', 'Growth']
     data = df_merge.dropna(subset=vars_list).copy()
 
-    for col in vars_list:
-        data[col] = winsorize_series(data[col])
-
-    X = data[['Positive_Tone', 'Negative_Tone', 'Leverage', 'Growth']]
-    y = data['ROE']
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    # 3. 模型竞技
-    results = []
-
-    # OLS
-    ols = LinearRegression()
-    ols.fit(X_train, y_train)
-    y_pred_ols = ols.predict(X_test)
-    results.append({
-        'Model': 'OLS Regression (Baseline)',
-        'R-squared': round(r2_score(y_test, y_pred_ols), 3),
-        'RMSE': round(np.sqrt(mean_squared_error(y_test, y_pred_ols)), 3),
-        'MAE': round(mean_absolute_error(y_test, y_pred_ols), 3)
-    })
-
-    # Random Forest
-    rf = RandomForestRegressor(n_estimators=100, random_state=42)
-    rf.fit(X_train, y_train)
-    y_pred_rf = rf.predict(X_test)
-    results.append({
-        'Model': 'Random Forest',
-        'R-squared': round(r2_score(y_test, y_pred_rf), 3),
-        'RMSE': round(np.sqrt(mean_squared_error(y_test, y_pred_rf)), 3),
-        'MAE': round(mean_absolute_error(y_test, y_pred_rf), 3)
-    })
-
-    # Gradient Boosting
-    gbr = GradientBoostingRegressor(n_estimators=100, random_state=42)
-    gbr.fit(X_train, y_train)
-    y_pred_gbr = gbr.predict(X_test)
-    results.append({
-        'Model': 'Gradient Boosting',
-        'R-squared': round(r2_score(y_test, y_pred_gbr), 3),
-        'RMSE': round(np.sqrt(mean_squared_error(y_test, y_pred_gbr)), 3),
-        'MAE': round(mean_absolute_error(y_test, y_pred_gbr), 3)
-    })
+    # 先划分再缩尾：边界只在训练集上计算，再用同一组边界处理测试集，测试数据不参与 fit
+    train, test = train_test_split(data, test_size=0.2, random_state=42)
+    winsorizer = Winsorizer(vars_list, group_by=WINSOR_GROUP).fit(train)
+    winsorizer.save(WINSOR_BOUNDS_FILE)
+    train, test = winsorizer.transform(train), winsorizer.transform(test)
+
+    features = ['Positive_Tone', 'Negative_Tone', 'Leverage', 'Growth']
+    X_train, X_test, y_train, y_test = train[features], test[features], train['ROE'], test['ROE']
+
+    # 3. 模型竞技 (见 model_zoo.py)：各模型在独立子进程中同时训练，
+    # 除 R²/RMSE/MAE 外还记录训练耗时、预测吞吐量 (行/秒) 和峰值内存，选生产模型时可以兼顾速度
+    # 指纹命中缓存的模型直接读取，不再训练 (Cached 列为 True)
+    cache = ModelCache(MODEL_CACHE_DIR) if USE_MODEL_CACHE else None
+    results, models = run_models(X_train, y_train, X_test, y_test, names=model_names, workers=MODEL_WORKERS,
+                                 cache=cache, preprocessing=winsorizer.state())
 
     # 4. 保存 Table 3
     df_results = pd.DataFrame(results)
@@ -98,9 +73,25 @@ def run_ml_analysis():
     print("\n【成功】Table 3 已保存为: table3_ml_performance.csv")
     print("你可以直接复制里面的数据到 Word！")
 
+    # 4b. 滚动起点评估 (Table 4)：随机划分会把未来年份混进训练集，这里逐年向前预测
+    if ROLLING_EVALUATION:
+        df_folds, df_summary, df_pred = rolling_eval.rolling_evaluation(
+            data, features, 'ROE', model_names, winsor_columns=vars_list, workers=MODEL_WORKERS,
+            cache=cache, winsor_group=WINSOR_GROUP)
+        df_folds.to_csv(rolling_eval.RESULTS_FILE, index=False, encoding='utf-8-sig')
+        df_summary.to_csv(rolling_eval.SUMMARY_FILE, index=False, encoding='utf-8-sig')
+        df_pred.to_csv(rolling_eval.PREDICTIONS_FILE, index=False, encoding='utf-8-sig')
+        print("\n" + "=" * 20 + f" Table 4: Rolling-Origin Evaluation ({rolling_eval.WINDOW}) " + "=" * 20)
+        print(df_summary)
+        print(f"【成功】逐年指标: {rolling_eval.RESULTS_FILE}，汇总: {rolling_eval.SUMMARY_FILE}，"
+              f"逐行预测: {rolling_eval.PREDICTIONS_FILE}")
+
     # 5. 生成图片
-    importance = rf.feature_importances_  # 这里用随机森林的特征重要性
-    feature_names = X.columns
+    if 'Random Forest' not in models:
+        print("提示：MODELS_TO_RUN 中没有 'Random Forest'，跳过特征重要性图")
+        return
+    importance = models['Random Forest'].feature_importances_  # 这里用随机森林的特征重要性
+    feature_names = features
     df_imp = pd.DataFrame({'Feature': feature_names, 'Importance': importance})
     df_imp = df_imp.sort_values(by='Importance', ascending=False)
 
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import hashlib
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+# =================配置区域=================
+CACHE_DIR = 'model_cache'  # 训练好的模型和测试集预测的缓存目录
+MMAP_MODE = 'r'  # 读取时内存映射其中的数组 (大森林、长预测向量不必整份读进内存)；None 为完整读入
+CACHE_VERSION = 1  # 缓存内容的格式或指纹规则变化时加 1，旧缓存自动失效
+
+
+# =========================================
+# 按指纹缓存训练结果：指纹 = 训练/测试矩阵的内容 + 特征列表 + 预处理参数 (缩尾边界) + 模型类和超参数 + 库版本。
+# 任何一项变化都会得到新的指纹，不会读到过期的模型；都没变时直接读取缓存，跳过训练。
+# 每个条目一个 joblib 文件 (不压缩，才能内存映射)，按指纹前两位分子目录；先写临时文件再改名，中断不会留下半个文件。
+# 不影响结果的参数 (n_jobs、verbose) 不计入指纹，换一台核数不同的机器也能命中。
+
+IGNORED_PARAMS = ('n_jobs', 'verbose')
+
+
+def _update(h, part):
+    if isinstance(part, (pd.DataFrame, pd.Series)):
+        # hash_pandas_object 使用固定的哈希键，同样的内容在不同进程、不同机器上结果相同
+        h.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+        names = list(part.columns) if isinstance(part, pd.DataFrame) else [part.name]
+        dtypes = list(part.dtypes) if isinstance(part, pd.DataFrame) else [part.dtype]
+        h.update(json.dumps([[str(n) for n in names], [str(t) for t in dtypes]]).encode('utf-8'))
+    elif isinstance(part, np.ndarray):
+        h.update(f"{part.dtype}{part.shape}".encode('utf-8'))
+        h.update(np.ascontiguousarray(part).tobytes())
+    else:
+        h.update(json.dumps(part, sort_keys=True, default=repr, ensure_ascii=False).encode('utf-8'))
+
+
+def fingerprint(*parts):
+    """
+    若干部分 (DataFrame / Series / 数组 / 可 JSON 化的参数) 合在一起的 SHA-256
+    """
+    h = hashlib.sha256(f"model_cache/{CACHE_VERSION}".encode('utf-8'))
+    for part in parts:
+        h.update(b'\x00')
+        _update(h, part)
+    return h.hexdigest()
+
+
+def estimator_params(model):
+    """
+    模型的类名、超参数和所属库的版本 (用作指纹的一部分)
+    """
+    module = type(model).__module__.split('.')[0]
+    return {
+        'class': f"{type(model).__module__}.{type(model).__qualname__}",
+        'version': getattr(sys.modules.get(module), '__version__', None),
+        'sklearn': sklearn.__version__,
+        'params': {k: v for k, v in model.get_params().items() if k not in IGNORED_PARAMS},
+    }
+
+
+class ModelCache:
+    """
+    指纹 -> 训练结果 (任意可 pickle 的对象，通常是 {'row', 'model', 'y_pred'}) 的磁盘缓存
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, mmap_mode=MMAP_MODE):
+        self.cache_dir = cache_dir
+        self.mmap_mode = mmap_mode
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.joblib')
+
+    def load(self, key):
+        """
+        读取缓存条目；不存在或文件损坏时返回 None (按未命中处理，重新训练后覆盖)
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return joblib.load(path, mmap_mode=self.mmap_mode)
+        except Exception as e:
+            print(f"  [缓存] 读取失败，将重新训练: {path} ({e})")
+            return None
+
+    def save(self, key, value):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
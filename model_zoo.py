@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import multiprocessing
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from threadpoolctl import threadpool_limits
+
+from model_cache import fingerprint, estimator_params
+
+try:
+    import lightgbm  # 可选: pip install lightgbm
+except ImportError:
+    lightgbm = None
+
+try:
+    import xgboost  # 可选: pip install xgboost
+except ImportError:
+    xgboost = None
+
+# =================配置区域=================
+RANDOM_STATE = 42
+MODEL_WORKERS = min(4, os.cpu_count() or 1)  # 同时训练的模型数 (每个模型一个子进程)
+THROUGHPUT_ROWS = 100000  # 测预测吞吐量时把测试集重复到这么多行，测试集很小时计时才稳定
+
+
+# =========================================
+# 模型注册表：名称 -> 构造函数。子进程按名称重新构造模型，不需要序列化未训练的模型。
+# 直方图类模型 (HistGradientBoosting / LightGBM / XGBoost hist) 先把特征分箱，训练开销随行数近似线性增长，
+# 样本扩大到全部 A 股多年面板时仍然可用；LightGBM / XGBoost 未安装时自动跳过。
+
+MODELS = {
+    'OLS Regression (Baseline)': lambda n_jobs: LinearRegression(),
+    'Random Forest': lambda n_jobs: RandomForestRegressor(n_estimators=100, random_state=RANDOM_STATE, n_jobs=n_jobs),
+    'Gradient Boosting': lambda n_jobs: GradientBoostingRegressor(n_estimators=100, random_state=RANDOM_STATE),
+    'Hist Gradient Boosting': lambda n_jobs: HistGradientBoostingRegressor(random_state=RANDOM_STATE),
+}
+if lightgbm is not None:
+    MODELS['LightGBM'] = lambda n_jobs: lightgbm.LGBMRegressor(
+        n_estimators=200, random_state=RANDOM_STATE, n_jobs=n_jobs, verbose=-1)
+if xgboost is not None:
+    MODELS['XGBoost (hist)'] = lambda n_jobs: xgboost.XGBRegressor(
+        n_estimators=200, tree_method='hist', random_state=RANDOM_STATE, n_jobs=n_jobs)
+
+
+def _proc_status_mb(field):
+    """
+    Linux 的 /proc/self/status 中的某项内存 (VmRSS 当前 / VmHWM 峰值)，单位 MB；不可用时返回 None
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb():
+    """
+    当前进程此刻占用的物理内存 (MB)；取不到时返回 None
+    """
+    rss = _proc_status_mb('VmRSS')
+    if rss is None:
+        try:
+            import psutil
+            rss = psutil.Process().memory_info().rss / 1024 / 1024
+        except Exception:
+            pass
+    return rss
+
+
+def reset_peak_rss():
+    """
+    把当前进程的峰值内存重置为当前值 (Linux 4.0+ 向 /proc/self/clear_refs 写入 5)，之后的峰值只反映此后的用量。
+    fork 出的进程池子进程会带着之前的高水位 (导入库、上一个任务)，不重置时峰值可能一直是旧值。返回是否成功
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """
+    当前进程的峰值内存 (MB)：Linux 优先读 VmHWM (可被 reset_peak_rss 重置)；
+    否则用 ru_maxrss (Linux 单位是 KB，macOS 是字节)，Windows 用 psutil 的 peak_wset
+    """
+    peak = _proc_status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except Exception:
+            return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+def fit_model(task):
+    """
+    子进程中训练并评估一个模型 (task 为 (名称, X_train, y_train, X_test, y_test, 线程数))。
+    Peak_Memory_MB 为训练和预测期间的峰值内存减去训练前此刻的内存 (子进程自己测量：先重置峰值，再取当前值作基线，
+    不受父进程或同一子进程之前任务的高水位影响；无法重置峰值的平台上可能偏大)；线程数同时限制 n_jobs 和 OpenMP/BLAS，
+    几个模型并行时 CPU 不会被超额占用。返回 (结果行, 训练好的模型, 测试集预测)
+    """
+    name, X_train, y_train, X_test, y_test, n_jobs = task
+    reset_peak_rss()
+    baseline_mb = current_rss_mb()  # 接收数据后、训练前此刻的内存，作为基线
+    with threadpool_limits(limits=n_jobs):
+        model = MODELS[name](n_jobs)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        y_pred = model.predict(X_test)
+        # 吞吐量：把测试集重复到 THROUGHPUT_ROWS 行后计时
+        X_bulk = X_test.iloc[np.resize(np.arange(len(X_test)), max(THROUGHPUT_ROWS, len(X_test)))]
+        start = time.perf_counter()
+        model.predict(X_bulk)
+        predict_seconds = time.perf_counter() - start
+
+    peak_mb = peak_rss_mb()
+    row = {
+        'Model': name,
+        'R-squared': round(r2_score(y_test, y_pred), 3),
+        'RMSE': round(np.sqrt(mean_squared_error(y_test, y_pred)), 3),
+        'MAE': round(mean_absolute_error(y_test, y_pred), 3),
+        'Fit_Seconds': round(fit_seconds, 3),
+        'Predict_Rows_per_Sec': int(len(X_bulk) / predict_seconds) if predict_seconds > 0 else None,
+        'Peak_Memory_MB': round(max(peak_mb - baseline_mb, 0.0), 1)
+        if peak_mb is not None and baseline_mb is not None else None,
+    }
+    return row, model, y_pred
+
+
+def check_model_names(names):
+    """
+    names 为 None 时返回注册表中的全部模型名；有未注册 (拼错或可选依赖未安装) 的名称时抛出 ValueError
+    """
+    if names is None:
+        return list(MODELS)
+    unknown = [name for name in names if name not in MODELS]
+    if unknown:
+        raise ValueError(f"未知的模型: {', '.join(unknown)}；可选: {', '.join(MODELS)}")
+    return list(names)
+
+
+def make_pool(workers, maxtasksperchild=None):
+    """
+    训练用的进程池。fork 启动的子进程不必重新导入主脚本 (ml_analysis 导入 matplotlib/seaborn 要几秒)；
+    主进程自己不训练模型，fork 前没有启动过 OpenMP 线程池。Windows 没有 fork，退回 spawn
+    """
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method).Pool(processes=workers, maxtasksperchild=maxtasksperchild)
+
+
+def run_models(X_train, y_train, X_test, y_test, names=None, workers=MODEL_WORKERS, cache=None, preprocessing=None):
+    """
+    并行训练注册表中的模型 (names 为 None 时全部训练)，返回 (按 names 顺序的结果行列表, {名称: 训练好的模型})。
+    每个模型在独立的子进程中训练 (每个进程只做一个任务)，CPU 核数在同时运行的模型间平分。
+    给出 cache (model_cache.ModelCache) 时，指纹 (数据、特征、preprocessing 参数、模型超参数) 命中的模型直接读取，
+    不再训练；结果行的 Cached 列标明来源，此时训练耗时等指标是当初训练时记录的
+    """
+    names = check_model_names(names)
+    keys = {name: fingerprint('model_zoo', name, estimator_params(MODELS[name](1)), list(X_train.columns),
+                              X_train, y_train, X_test, y_test, preprocessing)
+            for name in names} if cache is not None else {}
+
+    outputs = {}
+    for name in keys:
+        entry = cache.load(keys[name])
+        if entry is not None:
+            outputs[name] = ({**entry['row'], 'Cached': True}, entry['model'])
+    missing = [name for name in names if name not in outputs]
+    if cache is not None:
+        print(f"模型缓存: 命中 {len(outputs)} 个，需要训练 {len(missing)} 个")
+
+    if missing:
+        workers = max(1, min(workers, len(missing)))
+        n_jobs = max(1, (os.cpu_count() or 1) // workers)
+        tasks = [(name, X_train, y_train, X_test, y_test, n_jobs) for name in missing]
+        with make_pool(workers, maxtasksperchild=1) as pool:
+            fitted = pool.map(fit_model, tasks, chunksize=1)
+        for name, (row, model, y_pred) in zip(missing, fitted):
+            if cache is not None:
+                cache.save(keys[name], {'row': row, 'model': model, 'y_pred': y_pred})
+            outputs[name] = ({**row, 'Cached': False}, model)
+
+    rows = [outputs[name][0] for name in names]
+    models = {name: outputs[name][1] for name in names}
+    return rows, models
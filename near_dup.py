@@ -0,0 +1,171 @@
+import re
+import zlib
+import sqlite3
+
+import numpy as np
+
+# =================配置区域=================
+FIRST_PAGES = 3  # 取前几页文本做指纹 (封面、重要提示、目录)
+SHINGLE_SIZE = 5  # 字符 k-gram 的长度
+MIN_SHINGLES = 50  # 前几页的 k-gram 少于这个数 (扫描件、纯图片、提取不到文字) 时不计算签名，不参与比较
+NUM_PERM = 128  # MinHash 签名长度
+BANDS = 32  # LSH 分段数 (每段 NUM_PERM / BANDS 行)；相似度约 0.4 以上的文档才会成为候选
+THRESHOLD = 0.9  # 估计的 Jaccard 相似度不低于这个值视为近似重复
+SCOPE = 'year'  # 比较范围：'year' 只比较同一股票同一年份的文件；'code' 比较同一股票的所有文件 (发布日期跨年的重传)
+CANONICAL = 'latest'  # 一组近似重复中保留哪份：'latest' 发布日期最新 (通常是修订版)；'first' 最早发布的
+SIGNATURE_DB = 'near_dup.sqlite'  # 指纹缓存库，按 sha256 保存，文件不变就不再读取 PDF
+SEED = 1
+
+
+# =========================================
+# 近似重复检测：巨潮上同一份年报常被上传多次 (修订版、换日期重传)，字节不同但内容几乎一样。
+# 取前几页文本的字符 k-gram 集合计算 MinHash 签名，两份文档签名中相同位置取值相等的比例即为
+# Jaccard 相似度的估计；用 LSH 分段索引只比较可能相似的文档，文档数再多也不必两两比较。
+
+KEEP_CHARS = re.compile(r'[^\u4e00-\u9fa50-9]')  # 保留数字：不同年份的封面只差年份数字
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    """
+    清洗后文本的字符 k-gram，映射为 32 位哈希值 (crc32，跨进程稳定)
+    """
+    text = KEEP_CHARS.sub('', text or '')
+    if len(text) < k:
+        return {zlib.crc32(text.encode('utf-8'))} if text else set()
+    return {zlib.crc32(text[i:i + k].encode('utf-8')) for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    """
+    NUM_PERM 个随机线性哈希 (a·x + b) mod p，签名为每个哈希在 k-gram 集合上的最小值
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, shingle_set, min_shingles=MIN_SHINGLES):
+        """
+        k-gram 太少时返回 None：空集合的签名全是最大值，所有没有文字的文件彼此 "完全相同"，不能拿来比较
+        """
+        if len(shingle_set) < max(1, min_shingles):
+            return None
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        hashed = (np.outer(values, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return hashed.min(axis=0).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """
+    两个签名估计的 Jaccard 相似度
+    """
+    return float(np.mean(sig_a == sig_b))
+
+
+class LshIndex:
+    """
+    把签名切成 BANDS 段，任一段完全相同的文档互为候选
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS):
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def _keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, doc_id, signature):
+        self.signatures[doc_id] = signature
+        for band, key in self._keys(signature):
+            self.buckets[band].setdefault(key, []).append(doc_id)
+
+    def query(self, signature):
+        """
+        返回候选文档 [(doc_id, 估计相似度)]，按相似度从高到低
+        """
+        candidates = set()
+        for band, key in self._keys(signature):
+            candidates.update(self.buckets[band].get(key, ()))
+        scored = [(doc_id, similarity(signature, self.signatures[doc_id])) for doc_id in candidates]
+        return sorted(scored, key=lambda x: -x[1])
+
+
+class SignatureStore:
+    """
+    MinHash 签名缓存 (SQLite)：键为文件内容的 sha256 和签名参数
+    """
+
+    def __init__(self, db_path=SIGNATURE_DB):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                sha256 TEXT NOT NULL,
+                params TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                PRIMARY KEY (sha256, params)
+            )
+        """)
+        self.conn.commit()
+        self.params = f"p{FIRST_PAGES}-k{SHINGLE_SIZE}-n{NUM_PERM}-s{SEED}-m{MIN_SHINGLES}"
+
+    def get(self, sha256):
+        """
+        没有缓存时返回 None；缓存的是 "文字太少、没有签名" 时返回空数组
+        """
+        row = self.conn.execute(
+            "SELECT signature FROM signatures WHERE sha256 = ? AND params = ?", (sha256, self.params)
+        ).fetchone()
+        return np.frombuffer(row[0], dtype=np.uint32) if row else None
+
+    def put(self, sha256, signature):
+        """
+        signature 为 None (文字太少) 时保存为空值，之后不必再读取这份 PDF
+        """
+        blob = signature.astype(np.uint32).tobytes() if signature is not None else b''
+        self.conn.execute(
+            "INSERT OR REPLACE INTO signatures (sha256, params, signature) VALUES (?, ?, ?)",
+            (sha256, self.params, blob)
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def find_near_duplicates(docs, get_signature, canonical=CANONICAL, threshold=THRESHOLD):
+    """
+    docs 为 [(doc_id, 分组键, 排序键)]，只在分组键相同的文档之间比较；
+    排序键越大越新 ('latest' 优先保留排序键最大的，'first' 优先保留最小的)。
+    get_signature(doc_id) 返回签名 (只会对分组中不止一份的文档调用)；返回 None 的文档 (打不开或文字太少)
+    不进入索引，也不会被判为任何文档的重复。
+    返回 {重复文档 id: (保留的文档 id, 估计相似度)}
+    """
+    groups = {}
+    for doc_id, group, order_key in docs:
+        groups.setdefault(group, []).append((order_key, doc_id))
+
+    duplicates = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(reverse=(canonical == 'latest'))
+        index = LshIndex()
+        for _, doc_id in members:
+            signature = get_signature(doc_id)
+            if signature is None:
+                continue
+            match = next(iter(index.query(signature)), None)
+            if match and match[1] >= threshold:
+                duplicates[doc_id] = match
+            else:
+                # 组内更优先的版本先进入索引，后面的近似重复都指向它
+                index.add(doc_id, signature)
+    return duplicates
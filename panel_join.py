@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# =================配置区域=================
+# 同一公司同一年份有多行时 (例如同一年报的修订版、换日期重传都解析出了语调) 的处理方式：
+# 'latest'    保留发布日期最新的一行 (按 PublishDate 列，extract_tone 从文件名写入；没有该列时只能按文件中的顺序
+#             保留最后一行，不一定是最新的修订版，出现重复时会打印警告)
+# 'mean'      数值列取平均，其他列取第一行
+# 'max_words' 保留 Word_Count 最大的一行 (没有 Word_Count 列时同 'latest')
+DUPLICATE_POLICY = 'latest'
+KEY_COLUMNS = ['StockCode', 'Year']
+
+
+# =========================================
+# 面板连接：把 (StockCode, Year) 编码为一个 int64 键 = 6 位代码 × 10000 + 年份，
+# 每个来源先按策略去重，使键唯一并排序，之后的连接就是两个有序唯一整数索引的归并，
+# 不会因为一边有重复行而把另一边的行复制多份。
+
+def normalize_codes(codes):
+    """
+    统一股票代码为 6 位数字字符串 (向量化)：取末尾的数字部分，"sz.000001"、"000001.SZ"、1 都变为 "000001"；
+    没有数字的代码返回 NaN。字符串操作只在去重后的代码上做一次 (全部 A 股不过几千个)，再按编号映射回每一行
+    """
+    inverse, uniques = pd.factorize(codes, use_na_sentinel=False)
+    digits = pd.Series(uniques).astype(str).str.strip().str.extract(r'(\d+)(?:\.[A-Za-z]+)?$', expand=False)
+    return pd.Series(digits.str.zfill(6).values[inverse], index=codes.index)
+
+
+def panel_keys(codes, years):
+    """
+    (股票代码, 年份) -> int64 键 = 6 位代码 × 10000 + 年份；代码或年份无效时为 -1
+    """
+    inverse, uniques = pd.factorize(codes, use_na_sentinel=False)
+    code_num = pd.to_numeric(normalize_codes(pd.Series(uniques)), errors='coerce').values[inverse]
+    year_num = pd.to_numeric(years, errors='coerce').values.astype(np.float64)
+    keys = code_num * 10000 + year_num
+    return pd.Series(np.where(np.isnan(keys), -1, keys).astype(np.int64), index=codes.index)
+
+
+def split_key(keys):
+    """
+    int64 键 -> (StockCode 分类数组, 年份)
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    code_values, inverse = np.unique(keys // 10000, return_inverse=True)
+    categories = pd.Index(code_values).astype(str).str.zfill(6)
+    return pd.Categorical.from_codes(inverse, categories), (keys % 10000).astype(np.int16)
+
+
+def dedupe(df, policy=DUPLICATE_POLICY):
+    """
+    按策略去掉重复键，返回以 PanelKey 为唯一有序索引的 DataFrame 以及统计 {'rows', 'keys', 'duplicate_keys', 'dropped'}
+    """
+    keys = df['PanelKey'].values
+    date_missing = False
+    if policy == 'max_words' and 'Word_Count' in df.columns:
+        order = np.lexsort((df['Word_Count'].values, keys))
+    elif 'PublishDate' in df.columns:
+        order = np.lexsort((pd.factorize(df['PublishDate'], sort=True)[0], keys))
+    else:
+        # 稳定排序：键相同时保持原有顺序，最后一行即为要保留的一行
+        order = np.argsort(keys, kind='stable')
+        date_missing = policy != 'mean'
+    sorted_keys = keys[order]
+    last = np.append(sorted_keys[1:] != sorted_keys[:-1], True) if len(keys) else np.zeros(0, dtype=bool)
+    first = np.roll(last, 1) if len(keys) else last
+    run_lengths = np.diff(np.append(-1, np.flatnonzero(last)))
+    stats = {
+        'rows': len(df),
+        'keys': int(last.sum()),
+        'duplicate_keys': int((run_lengths > 1).sum()),
+        'dropped': int(len(df) - last.sum()),
+    }
+    if date_missing and stats['dropped']:
+        print(f"警告：{stats['duplicate_keys']} 个公司-年份有重复行，但数据没有 PublishDate 列，"
+              f"'{policy}' 只能保留文件中的最后一行，不一定是最新的修订版 (请用新版 extract_tone.py 重新导出语调结果)")
+
+    columns = [c for c in df.columns if c != 'PanelKey']
+    if policy == 'mean' and stats['dropped']:
+        numeric = [c for c in columns if pd.api.types.is_numeric_dtype(df[c])]
+        others = [c for c in columns if c not in numeric]
+        grouped = df.groupby('PanelKey', sort=True)
+        result = grouped[numeric].mean()
+        if others:
+            result = grouped[others].first().join(result)
+        return result[columns], stats
+
+    keep = order[last] if policy != 'mean' else order[first]
+    result = df[columns].iloc[keep]
+    result.index = pd.Index(sorted_keys[last], name='PanelKey')
+    return result, stats
+
+
+def prepare(df, policy=DUPLICATE_POLICY):
+    """
+    统一代码、编码键并去重；无效代码或年份的行丢弃并计数
+    """
+    keys = panel_keys(df['StockCode'], df['Year'])
+    invalid = keys < 0
+    df = df.drop(columns=KEY_COLUMNS).assign(PanelKey=keys)[~invalid]
+    result, stats = dedupe(df, policy)
+    stats['invalid'] = int(invalid.sum())
+    return result, stats
+
+
+def join_panel(sources, how='inner', policy=DUPLICATE_POLICY):
+    """
+    按 (StockCode, Year) 连接多个来源。sources 为 {名称: DataFrame} (按插入顺序连接，列名重复时后面的来源加 _名称 后缀)。
+    返回 (面板 DataFrame，统计字典)；面板按键排序，前三列为 PanelKey、StockCode、Year
+    """
+    stats = {}
+    panel = None
+    indexes = {}
+    for name, df in sources.items():
+        prepared, stats[name] = prepare(df, policy)
+        indexes[name] = prepared.index
+        if panel is None:
+            panel = prepared
+            continue
+        overlap = panel.columns.intersection(prepared.columns)
+        prepared = prepared.rename(columns={c: f"{c}_{name}" for c in overlap})
+        # 两边都是有序唯一的整数索引，pandas 走归并连接
+        panel = panel.join(prepared, how=how)
+
+    for name, index in indexes.items():
+        stats[name]['matched'] = int(index.isin(panel.index).sum())
+    stats['panel_rows'] = len(panel)
+
+    codes, years = split_key(panel.index.values)
+    panel = panel.reset_index()
+    panel.insert(1, 'StockCode', codes)
+    panel.insert(2, 'Year', years)
+    return panel, stats
+
+
+def format_stats(stats):
+    """
+    连接统计的文字说明 (每个来源一行)
+    """
+    lines = []
+    for name, s in stats.items():
+        if name == 'panel_rows':
+            continue
+        lines.append(f"  {name}: {s['rows']} 行，{s['keys']} 个公司-年份，其中 {s['duplicate_keys']} 个有重复 "
+                     f"(去掉 {s['dropped']} 行)，无效代码/年份 {s['invalid']} 行，匹配 {s['matched']} 个")
+    lines.append(f"  面板: {stats['panel_rows']} 行")
+    return '\n'.join(lines)
@@ -0,0 +1,163 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import panel_join
+from pdf_store import hash_file
+
+# =================配置区域=================
+FILE_TONE = 'tone_results.csv'  # X: 语调数据 (extract_tone.py 的输出)
+FILE_FINANCE = 'financial_data_real.csv'  # Y: 财务数据 (get_finance_data.py 的输出)
+PANEL_FILE = 'panel.arrow'  # 合并后的面板缓存 (Arrow IPC 文件，不压缩，可内存映射读取)
+PANEL_VERSION = 2  # 面板的构建规则 (类型、合并方式) 变化时加 1，旧缓存自动失效
+DUPLICATE_POLICY = panel_join.DUPLICATE_POLICY  # 同一公司-年份有多份语调结果时的处理方式 (见 panel_join.py)
+
+
+# =========================================
+# 共享的数据层：inal_analysis.py / final_analysis_pro.py / ml_analysis.py 都从这里读取合并好的面板。
+# 第一次运行时读取两个 CSV，按 (StockCode, Year) 的整数键去重后内连接 (见 panel_join.py)，并转成紧凑类型：
+#   StockCode -> category，Year -> int16，PanelKey -> int64，浮点指标 -> float32，计数 -> int32
+# 结果连同两个源文件的指纹 (大小、修改时间、SHA-256) 写入 PANEL_FILE；
+# 之后源文件没有变化时直接内存映射读取缓存，不再解析 CSV 和合并。
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': hash_file(path)}
+
+
+def compact_types(df):
+    """
+    StockCode 转为 category，Year 转为 int16，浮点列转为 float32，整数列 (PanelKey 除外) 转为 int32，
+    其余文本列转为 category
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col == 'StockCode':
+            df[col] = df[col].astype('category')
+        elif col == 'Year':
+            df[col] = df[col].astype(np.int16)
+        elif col == 'PanelKey':
+            continue
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = df[col].astype(np.int32)
+        elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def read_source(path):
+    """
+    读取一个源 CSV：StockCode 按字符串读取 (按整数读会丢掉前导零)
+    """
+    return pd.read_csv(path, dtype={'StockCode': str})
+
+
+def build_panel(tone_file=FILE_TONE, finance_file=FILE_FINANCE, policy=DUPLICATE_POLICY):
+    """
+    读取两个 CSV，各自按 policy 去重后按 (StockCode, Year) 内连接，返回 (紧凑类型的面板, 连接统计)
+    """
+    sources = {'finance': read_source(finance_file), 'tone': read_source(tone_file)}
+    # 只有当 "股票代码" 和 "年份" 都对得上时，才拼在一起
+    df_merge, stats = panel_join.join_panel(sources, how='inner', policy=policy)
+    return compact_types(df_merge), stats
+
+
+def save_panel(df, path, meta):
+    """
+    写入 Arrow IPC 文件 (不压缩，读取时可直接内存映射)，构建信息保存在 schema 元数据中
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           b'panel_meta': json.dumps(meta).encode('utf-8')})
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_panel_meta(path):
+    """
+    只读取缓存文件的 schema 元数据 (不读数据)；文件不存在或损坏时返回 None
+    """
+    try:
+        with pa.memory_map(path, 'r') as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        return json.loads(metadata[b'panel_meta'])
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+
+
+def sources_unchanged(meta, sources):
+    """
+    源文件大小和修改时间都没变时直接认为未变化；否则比较 SHA-256 (只是被 touch 过的文件不会触发重建)。
+    返回 (是否未变化, 内容未变但修改时间变了的源文件 {名称: 新指纹})，后者用于刷新缓存中记录的修改时间
+    """
+    recorded = meta.get('sources', {})
+    touched = {}
+    for name, path in sources.items():
+        old = recorded.get(name)
+        if old is None or not os.path.exists(path):
+            return False, {}
+        stat = os.stat(path)
+        if stat.st_size != old['size']:
+            return False, {}
+        if stat.st_mtime_ns != old['mtime_ns']:
+            sha256 = hash_file(path)
+            if sha256 != old['sha256']:
+                return False, {}
+            touched[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    return True, touched
+
+
+def load_panel(tone_file=FILE_TONE, finance_file=FILE_FINANCE, panel_file=PANEL_FILE, rebuild=False,
+               policy=DUPLICATE_POLICY):
+    """
+    返回合并好的面板 DataFrame：缓存有效时内存映射读取，否则重新构建、打印连接统计并写入缓存。
+    源文件缺失时返回 None
+    """
+    if not os.path.exists(tone_file) or not os.path.exists(finance_file):
+        return None
+    sources = {'tone': tone_file, 'finance': finance_file}
+
+    meta = None if rebuild else read_panel_meta(panel_file)
+    if meta and meta.get('version') == PANEL_VERSION and meta.get('policy') == policy:
+        unchanged, touched = sources_unchanged(meta, sources)
+        if unchanged:
+            with pa.memory_map(panel_file, 'r') as source:
+                df = pa.ipc.open_file(source).read_all().to_pandas()
+            if touched:
+                # 源文件只是被 touch 过：记下新的修改时间，之后的读取不必每次重新计算 SHA-256
+                save_panel(df, panel_file, {**meta, 'sources': {**meta['sources'], **touched}})
+            return df
+
+    df, stats = build_panel(tone_file, finance_file, policy)
+    print(f"已重新构建面板 (重复处理: {policy})：\n{panel_join.format_stats(stats)}")
+    save_panel(df, panel_file, {
+        'version': PANEL_VERSION,
+        'policy': policy,
+        'sources': {name: file_fingerprint(path) for name, path in sources.items()},
+        'stats': stats,
+    })
+    return df
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    panel = load_panel(rebuild=True)
+    if panel is None:
+        print(f"错误：找不到 {FILE_TONE} 或 {FILE_FINANCE}！")
+        exit()
+    print(f"已构建面板: {len(panel)} 行 × {panel.shape[1]} 列，用时 {(time.perf_counter() - start) * 1000:.1f} 毫秒")
+
+    start = time.perf_counter()
+    load_panel()
+    print(f"从缓存读取用时 {(time.perf_counter() - start) * 1000:.1f} 毫秒: {PANEL_FILE}")
+    print(panel.dtypes.to_string())
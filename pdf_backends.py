@@ -0,0 +1,181 @@
+import io
+import importlib
+
+# =================配置区域=================
+DEFAULT_BACKEND = 'pdfplumber'  # 默认的 PDF 文本提取后端
+
+
+# =========================================
+# 各后端统一接口：
+#   page_count()      -> 总页数
+#   page_text(index)  -> 第 index 页 (从 0 开始) 的文本，可能为空字符串
+#   outline()         -> 书签列表 [(层级, 标题, 页序)]，没有书签时为空列表
+#   close()
+# source 可以是文件路径，也可以是 BytesIO 等二进制文件对象。
+# pdfplumber 之外的后端都是可选依赖，只在被选用时才导入。
+
+def _pdfminer_outline(doc, page_ids):
+    """
+    读取 pdfminer 文档的书签，并把跳转目标解析为页序；page_ids 为 {页面对象 id: 页序}
+    """
+    from pdfminer.pdfdocument import PDFNoOutlines
+    from pdfminer.pdftypes import resolve1
+
+    entries = []
+    try:
+        for level, title, dest, action, _ in doc.get_outlines():
+            if dest is None and action is not None:
+                action = resolve1(action)
+                if isinstance(action, dict):
+                    dest = action.get('D')
+            dest = resolve1(dest)
+            if hasattr(dest, 'name'):
+                dest = dest.name
+            if isinstance(dest, (str, bytes)):
+                dest = resolve1(doc.get_dest(dest))
+            if isinstance(dest, dict):
+                dest = resolve1(dest.get('D'))
+            if isinstance(dest, list) and dest:
+                page = page_ids.get(getattr(dest[0], 'objid', None))
+                if page is not None:
+                    entries.append((level, str(title), page))
+    except PDFNoOutlines:
+        pass
+    except Exception:
+        # 书签损坏时返回已解析的部分，由调用方退回扫描目录页
+        pass
+    return entries
+
+
+class PdfplumberBackend:
+    """
+    pdfplumber：逐字符做版面分析，最慢但与历史结果完全一致
+    """
+    name = 'pdfplumber'
+    requires = 'pdfplumber'
+
+    def __init__(self, source):
+        import pdfplumber
+        self.pdf = pdfplumber.open(source)
+
+    def page_count(self):
+        return len(self.pdf.pages)
+
+    def outline(self):
+        page_ids = {page.page_obj.pageid: i for i, page in enumerate(self.pdf.pages)}
+        return _pdfminer_outline(self.pdf.doc, page_ids)
+
+    def page_text(self, index):
+        page = self.pdf.pages[index]
+        text = page.extract_text() or ''
+        # 释放该页缓存的字符对象，避免长文档内存持续增长
+        page.close()
+        return text
+
+    def close(self):
+        self.pdf.close()
+
+
+class PdfiumBackend:
+    """
+    pypdfium2 (pip install pypdfium2)：调用 PDFium 的 C 实现直接取文本，通常快一个数量级
+    """
+    name = 'pypdfium2'
+    requires = 'pypdfium2'
+
+    def __init__(self, source):
+        import pypdfium2
+        self.pdf = pypdfium2.PdfDocument(source)
+
+    def page_count(self):
+        return len(self.pdf)
+
+    def page_text(self, index):
+        page = self.pdf[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range() or ''
+        finally:
+            textpage.close()
+            page.close()
+
+    def outline(self):
+        entries = []
+        for item in self.pdf.get_toc():
+            if hasattr(item, 'get_title'):
+                dest = item.get_dest()
+                page = dest.get_index() if dest is not None else None
+                title = item.get_title()
+            else:  # pypdfium2 4.x 返回的是 PdfOutlineItem 具名元组
+                page, title = item.page_index, item.title
+            if page is not None:
+                entries.append((item.level, title, page))
+        return entries
+
+    def close(self):
+        self.pdf.close()
+
+
+class PdfminerBackend:
+    """
+    pdfminer.six 关闭版面分析 (laparams=None)：按内容流顺序输出字符，跳过最耗时的布局计算
+    """
+    name = 'pdfminer'
+    requires = 'pdfminer'
+
+    def __init__(self, source):
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        self.fp = open(source, 'rb') if isinstance(source, str) else source
+        self.doc = PDFDocument(PDFParser(self.fp))
+        self.rsrcmgr = PDFResourceManager(caching=True)
+        self.pages = list(PDFPage.create_pages(self.doc))
+
+    def page_count(self):
+        return len(self.pages)
+
+    def page_text(self, index):
+        from pdfminer.converter import TextConverter
+        from pdfminer.pdfinterp import PDFPageInterpreter
+
+        output = io.StringIO()
+        device = TextConverter(self.rsrcmgr, output, laparams=None)
+        try:
+            PDFPageInterpreter(self.rsrcmgr, device).process_page(self.pages[index])
+        finally:
+            device.close()
+        return output.getvalue()
+
+    def outline(self):
+        return _pdfminer_outline(self.doc, {page.pageid: i for i, page in enumerate(self.pages)})
+
+    def close(self):
+        self.fp.close()
+
+
+BACKENDS = {
+    PdfplumberBackend.name: PdfplumberBackend,
+    PdfiumBackend.name: PdfiumBackend,
+    PdfminerBackend.name: PdfminerBackend,
+}
+
+
+def open_pdf(source, backend=DEFAULT_BACKEND):
+    """
+    按名称打开 PDF，返回对应后端的实例
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的 PDF 后端: {backend}，可选: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](source)
+
+
+def require_backend(backend):
+    """
+    检查后端的依赖是否已安装：未安装时抛出 ImportError (而不是等到逐个文件打开时才失败)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的 PDF 后端: {backend}，可选: {', '.join(BACKENDS)}")
+    importlib.import_module(BACKENDS[backend].requires)
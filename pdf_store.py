@@ -0,0 +1,153 @@
+import os
+import re
+import shutil
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+# =================配置区域=================
+STORE_DIR = 'pdf_store'  # 内容寻址仓库：文件按 SHA-256 存放在 objects/ 下
+MANIFEST_DB = 'manifest.sqlite'  # 清单库文件名 (位于 STORE_DIR 内)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# =========================================
+
+def hash_file(path):
+    """
+    计算文件的 SHA-256
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def announcement_id_from_url(url):
+    """
+    巨潮的 PDF 链接形如 .../finalpage/2023-03-09/1216046529.PDF，文件名就是 announcementId
+    """
+    match = re.search(r'/(\d+)\.pdf', str(url), re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def fiscal_year_from_date(publish_date):
+    """
+    财报年份 = 发布年份 - 1 (与 extract_tone.get_year_from_filename 的口径一致)
+    """
+    match = re.match(r'(\d{4})', str(publish_date))
+    return int(match.group(1)) - 1 if match else None
+
+
+def link_or_copy(src, dst):
+    """
+    在 dst 位置生成 src 的硬链接 (不额外占用磁盘)；跨盘或文件系统不支持时退回复制
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class PdfStore:
+    """
+    内容寻址的 PDF 仓库：
+    - 文件本体按哈希存放在 objects/<前两位>/<sha256>.pdf，字节相同的年报只存一份；
+    - 清单 (manifest) 记录 (股票代码, 财报年份, 公告ID, 链接) -> (哈希, 大小, 下载时间, 文件名)；
+    - pdf_reports/ 下原来的 "代码_日期.pdf" 文件名作为指向对象的硬链接保留，后续脚本无需改动即可读取。
+    多个下载线程可以共用同一个实例。
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        os.makedirs(os.path.join(store_dir, 'objects'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(store_dir, MANIFEST_DB), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS manifest (
+                stock_code TEXT NOT NULL,
+                fiscal_year INTEGER,
+                announcement_id TEXT,
+                url TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                downloaded_at TEXT NOT NULL,
+                PRIMARY KEY (url, file_name)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_manifest_file ON manifest (file_name)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_manifest_sha ON manifest (sha256)")
+        self.conn.commit()
+
+    def object_path(self, sha256):
+        return os.path.join(self.store_dir, 'objects', sha256[:2], f"{sha256}.pdf")
+
+    def _lookup(self, column, value):
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT stock_code, fiscal_year, announcement_id, url, file_name, sha256, size, downloaded_at "
+                f"FROM manifest WHERE {column} = ? ORDER BY downloaded_at DESC LIMIT 1", (value,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ['stock_code', 'fiscal_year', 'announcement_id', 'url', 'file_name', 'sha256', 'size', 'downloaded_at']
+        record = dict(zip(keys, row))
+        # 对象文件被手动删除时视为不存在，需要重新下载
+        return record if os.path.exists(self.object_path(record['sha256'])) else None
+
+    def lookup_url(self, url):
+        """
+        按下载链接查清单，已入库时返回记录，否则返回 None
+        """
+        return self._lookup('url', url)
+
+    def lookup_file(self, file_name):
+        """
+        按 pdf_reports/ 中的文件名查清单
+        """
+        return self._lookup('file_name', file_name)
+
+    def add_file(self, path, stock_code, url, publish_date=None):
+        """
+        把刚下载好的文件收进仓库：按哈希移动到 objects/ (已有相同内容则直接丢弃)，
+        再在原路径放一个指向对象的硬链接，并写入清单。返回 sha256。
+        """
+        sha256 = hash_file(path)
+        size = os.path.getsize(path)
+        obj_path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+
+        if os.path.exists(obj_path):
+            if not os.path.samefile(path, obj_path):
+                os.remove(path)
+                link_or_copy(obj_path, path)
+        else:
+            os.replace(path, obj_path)
+            link_or_copy(obj_path, path)
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO manifest "
+                "(stock_code, fiscal_year, announcement_id, url, file_name, sha256, size, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (stock_code, fiscal_year_from_date(publish_date), announcement_id_from_url(url), url,
+                 os.path.basename(path), sha256, size, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            self.conn.commit()
+        return sha256
+
+    def restore(self, record, path):
+        """
+        清单里已有该文件时，直接从对象仓库恢复到目标路径，不走网络
+        """
+        obj_path = self.object_path(record['sha256'])
+        if not (os.path.exists(path) and os.path.samefile(path, obj_path)):
+            link_or_copy(obj_path, path)
+
+    def close(self):
+        self.conn.close()
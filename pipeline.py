@@ -0,0 +1,226 @@
+import io
+import os
+import time
+import queue
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import download_pdfs
+import extract_tone
+from pdf_store import PdfStore, hash_file
+from tone_store import TONE_DB, ToneStore
+
+# =================配置区域=================
+INPUT_CSV = download_pdfs.INPUT_CSV  # 爬虫生成的链接表
+OUTPUT_FILE = extract_tone.OUTPUT_FILE  # 结束时从结果库导出的语调 CSV (只含本次链接表中的文件，不含库里其他批次的结果)
+# 'disk'：与 download_pdfs.py 相同，下载到 pdf_reports/ (可断点续传、收进 pdf_store)，写完即交给解析进程；
+# 'memory'：下载到内存，解析进程直接从 BytesIO 读取，PDF 不落盘 (已在 pdf_store 中的文件仍从仓库读取)
+PIPELINE_MODE = 'disk'
+DOWNLOAD_WORKERS = download_pdfs.MAX_WORKERS  # 下载线程数
+EXTRACT_WORKERS = extract_tone.WORKERS  # 解析进程数
+# 已下载、尚未解析的 PDF 最多这么多份；队列满时下载线程阻塞等待 (背压)。磁盘上 (或内存中) 积压的文件数
+# 不会超过 QUEUE_SIZE + DOWNLOAD_WORKERS + 2 × EXTRACT_WORKERS + 1：队列中的、每个下载线程手上正在下载
+# 或等待放入队列的一份、已派发给解析进程的、以及主线程等待空闲解析进程时拿着的一份
+QUEUE_SIZE = 16
+
+
+# =========================================
+# 下载与解析重叠执行的流水线：
+#   下载线程池 --(有界队列)--> 主线程派发 --> 解析进程池 --> 主线程逐份写入结果库
+# 网络等待和 CPU 解析同时进行，总耗时接近 max(下载, 解析) 而不是两者之和。
+# 说明：近似重复检测 (near_dup) 需要事先看到同组的全部文件，流水线中不做；之后可再运行 extract_tone.py。
+
+_DONE = object()  # 下载全部结束的标记
+
+
+def fetch(task, store, scored, known_files, stats):
+    """
+    下载线程：取得一份 PDF，返回 (文件名, 股票代码, 年份, sha256, 来源)；来源为文件路径或字节串，
+    该内容已有当前版本的结果时来源为 None (只补写结果行)。失败返回 None
+    """
+    file_name, pdf_url, save_path, stock_code, publish_date = task
+    year = extract_tone.get_year_from_filename(file_name)
+    if not year:
+        print(f"{file_name} [跳过:无法解析年份]")
+        return None
+    if known_files.get(file_name) in scored:
+        # 结果库里已有这个文件的结果，不再下载
+        return file_name, stock_code, year, known_files[file_name], None
+
+    start = time.perf_counter()
+    record = store.lookup_url(pdf_url) if store is not None else None
+    if PIPELINE_MODE == 'memory' and record is None:
+        data = download_pdfs.fetch_pdf_bytes(pdf_url)
+        if data is None:
+            return None
+        sha256, source = hashlib.sha256(data).hexdigest(), data
+    elif PIPELINE_MODE == 'memory':
+        sha256, source = record['sha256'], store.object_path(record['sha256'])
+    else:
+        if download_pdfs.download_task(task) == '失败':
+            return None
+        record = store.lookup_file(file_name) if store is not None else None
+        sha256 = record['sha256'] if record else hash_file(save_path)
+        source = save_path
+    with stats['lock']:
+        stats['download_seconds'] += time.perf_counter() - start
+
+    return file_name, stock_code, year, sha256, (None if sha256 in scored else source)
+
+
+def produce(tasks, out_queue, store, scored, known_files, stats):
+    """
+    下载线程池：每完成一份就放入有界队列，队列满时 put 阻塞，下载随之暂停
+    """
+    def work(task):
+        try:
+            item = fetch(task, store, scored, known_files, stats)
+        except Exception as e:
+            print(f"{task[0]} [下载异常] {e}")
+            item = None
+        if item is not None:
+            out_queue.put(item)
+        else:
+            with stats['lock']:
+                stats['failed'] += 1
+
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        list(executor.map(work, tasks))
+    out_queue.put(_DONE)
+
+
+def extract_item(item):
+    """
+    解析进程的任务函数：来源为字节串时包装成 BytesIO，不写临时文件
+    """
+    file_name, sha256, source = item
+    start = time.perf_counter()
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    try:
+        tone_data = extract_tone.analyze_pdf(source, sha256)
+    except Exception as e:
+        print(f"  [解析异常] {file_name}: {e}")
+        tone_data = extract_tone.Failure(f"{type(e).__name__}: {e}")
+    return tone_data, time.perf_counter() - start
+
+
+def run_pipeline(tasks):
+    store = PdfStore() if download_pdfs.USE_PDF_STORE else None
+    download_pdfs.STORE = store
+
+    # 主进程也要加载词典 (scoring_version 依赖词典签名)；解析进程由 forkserver 启动，
+    # 不在下载线程运行时 fork 主进程，各自从 pickle 缓存加载词典 (约 0.2 秒)
+    extract_tone.init_jieba()
+    version = extract_tone.scoring_version()
+    tone_store = ToneStore(TONE_DB)
+    scored = tone_store.scored(version)
+    known_files = tone_store.scored_files(version)
+
+    stats = {'lock': threading.Lock(), 'download_seconds': 0.0, 'extract_seconds': 0.0, 'failed': 0}
+    downloaded = queue.Queue(maxsize=QUEUE_SIZE)
+    finished = queue.Queue()  # 解析进程池回调线程 -> 主线程
+    slots = threading.BoundedSemaphore(EXTRACT_WORKERS * 2)  # 已派发、未完成的解析任务上限
+    rows_by_sha = {}  # sha256 -> [(文件名, 代码, 年份, sha256)]，同内容只解析一次
+    in_flight = set()
+    counts = {'parsed': 0, 'reused': 0}
+
+    def record(sha256, tone_data):
+        # 主线程中写入结果库 (SQLite 连接不跨线程)；解析异常的结果记为 error，下次运行重试，本次也不复用
+        error = extract_tone.failure_reason(tone_data)
+        tone_store.save(rows_by_sha[sha256], version, tone_data, error=error)
+        if error is None:
+            scored[sha256] = tone_data
+
+    def drain():
+        while True:
+            try:
+                sha256, tone_data, seconds = finished.get_nowait()
+            except queue.Empty:
+                return
+            in_flight.discard(sha256)
+            stats['extract_seconds'] += seconds
+            counts['parsed'] += 1
+            print(f"[解析 {counts['parsed']}] {rows_by_sha[sha256][0][0]} ... "
+                  f"[{extract_tone.result_status(tone_data)}]")
+            record(sha256, tone_data)
+
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce, args=(tasks, downloaded, store, scored, known_files, stats), daemon=True)
+    producer.start()
+
+    # Windows 没有 forkserver，退回 spawn (同样不在下载线程运行时 fork 主进程)
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    with context.Pool(processes=EXTRACT_WORKERS, initializer=extract_tone.init_worker,
+                      maxtasksperchild=extract_tone.MAX_TASKS_PER_CHILD) as pool:
+        while True:
+            drain()
+            try:
+                item = downloaded.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            file_name, stock_code, year, sha256, source = item
+            rows_by_sha.setdefault(sha256, []).append((file_name, stock_code, year, sha256))
+            if sha256 in in_flight:
+                continue  # 同内容的文件正在解析，结果出来时一并写入
+            if source is None or sha256 in scored:
+                counts['reused'] += 1
+                record(sha256, scored[sha256])
+                continue
+
+            # 解析进程都忙时在这里等待，队列随之填满，下载线程暂停
+            while not slots.acquire(timeout=0.2):
+                drain()
+            in_flight.add(sha256)
+
+            def on_done(result, sha256=sha256):
+                slots.release()
+                finished.put((sha256, *result))
+
+            def on_error(error, sha256=sha256, file_name=file_name):
+                slots.release()
+                print(f"  [解析异常] {file_name}: {error}")
+                finished.put((sha256, extract_tone.Failure(f"{type(error).__name__}: {error}"), 0.0))
+
+            pool.apply_async(extract_item, ((file_name, sha256, source),),
+                             callback=on_done, error_callback=on_error)
+
+        while in_flight:
+            drain()
+            time.sleep(0.05)
+
+    elapsed = time.perf_counter() - start
+    # 只导出本次链接表中的文件；结果库里以前其他批次的结果仍在库中，需要时用 ToneStore.export_csv 全部导出
+    keys = {(stock_code, year, sha256) for rows in rows_by_sha.values() for _, stock_code, year, sha256 in rows}
+    rows = tone_store.export_csv(OUTPUT_FILE, version, keys)
+    tone_store.close()
+    if store is not None:
+        store.close()
+
+    print("\n" + "=" * 30)
+    print(f"流水线结束：解析 {counts['parsed']} 份，复用已有结果 {counts['reused']} 份，失败 {stats['failed']} 份")
+    print(f"总耗时 {elapsed:.1f} 秒；下载累计 {stats['download_seconds'] / DOWNLOAD_WORKERS:.1f} 秒 "
+          f"(按 {DOWNLOAD_WORKERS} 线程折算)，解析累计 {stats['extract_seconds'] / EXTRACT_WORKERS:.1f} 秒 "
+          f"(按 {EXTRACT_WORKERS} 进程折算)")
+    print(f"已从结果库导出 {rows} 条语调数据: {OUTPUT_FILE}")
+    print("=" * 30)
+
+
+if __name__ == "__main__":
+    if not os.path.exists(INPUT_CSV):
+        print(f"错误：找不到 {INPUT_CSV} 文件！请先运行上一步的爬虫代码。")
+        exit()
+    os.makedirs(download_pdfs.SAVE_DIR, exist_ok=True)
+
+    print("正在读取下载列表...")
+    tasks = download_pdfs.build_tasks(pd.read_csv(INPUT_CSV))
+    print(f"共 {len(tasks)} 个文件，模式: {PIPELINE_MODE}，{DOWNLOAD_WORKERS} 个下载线程，"
+          f"{EXTRACT_WORKERS} 个解析进程，队列上限 {QUEUE_SIZE}")
+    run_pipeline(tasks)
@@ -0,0 +1,140 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# =================配置区域=================
+LIMITS = (0.01, 0.01)  # 缩尾比例：前 1% 和后 1% 的极端值替换为边界值
+GROUP_BY = None  # 分组缩尾的列名：None 为全样本；'Year' 为逐年；有行业列时可填行业列名
+MIN_GROUP_SIZE = 20  # 样本少于这个数的分组分位数不可靠，改用全样本边界 (之后遇到训练时没见过的分组也用全样本边界)
+
+
+# =========================================
+
+def _to_json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _column_quantiles(columns_first, quantiles):
+    """
+    columns_first 为 (列数, 行数) 的连续数组：每列的分位数 (线性插值，与 pandas 的 quantile 相同，忽略 NaN)，
+    返回 (len(quantiles), 列数)。按行连续存放后每列的数据在内存中相邻，比直接对 (行数, 列数) 数组按 axis=0 计算快
+    """
+    if np.isnan(columns_first).any():
+        return np.nanquantile(columns_first, quantiles, axis=1)
+    return np.quantile(columns_first, quantiles, axis=1)
+
+
+class Winsorizer:
+    """
+    缩尾处理：把每列低于下分位数、高于上分位数的值替换为边界值。
+    fit 时所有列的边界用一次 quantile 计算 (分组时按分组排序一次，每组一次)；transform 只做一次向量化的 clip。
+    只在训练集上 fit，再用同一组边界 transform 训练集和测试集，测试数据不会影响边界；
+    边界可以保存为 JSON，新数据直接 load 后 transform，不必重新计算分位数
+    """
+
+    def __init__(self, columns, limits=LIMITS, group_by=GROUP_BY, min_group_size=MIN_GROUP_SIZE):
+        self.columns = list(columns)
+        self.limits = tuple(limits)
+        self.group_by = group_by
+        self.min_group_size = min_group_size
+        self.lower_ = None  # 全样本边界 (Series，索引为列名)
+        self.upper_ = None
+        self.group_lower_ = None  # 分组边界 (DataFrame，索引为分组值，列为列名)
+        self.group_upper_ = None
+
+    def fit(self, df):
+        if len(df) == 0:
+            raise ValueError(f"Winsorizer.fit 需要至少一行数据 (列: {', '.join(self.columns)})")
+        quantiles = [self.limits[0], 1 - self.limits[1]]
+        values = np.ascontiguousarray(df[self.columns].to_numpy(dtype=np.float64).T)
+        lower, upper = _column_quantiles(values, quantiles)
+        self.lower_ = pd.Series(lower, index=self.columns)
+        self.upper_ = pd.Series(upper, index=self.columns)
+
+        if self.group_by is not None:
+            # 按分组排序一次，每个分组是一段连续的切片，各自算一次所有列的分位数
+            codes, groups = pd.factorize(df[self.group_by], sort=True)
+            order = np.argsort(codes, kind='stable')
+            starts = np.searchsorted(codes[order], np.arange(len(groups) + 1))
+            kept, lowers, uppers = [], [], []
+            for k, group in enumerate(groups):
+                if starts[k + 1] - starts[k] < self.min_group_size:
+                    continue
+                lower, upper = _column_quantiles(values[:, order[starts[k]:starts[k + 1]]], quantiles)
+                kept.append(group)
+                lowers.append(lower)
+                uppers.append(upper)
+            index = pd.Index(kept, name=self.group_by)
+            self.group_lower_ = pd.DataFrame(lowers, index=index, columns=self.columns, dtype=np.float64)
+            self.group_upper_ = pd.DataFrame(uppers, index=index, columns=self.columns, dtype=np.float64)
+        return self
+
+    def transform(self, df):
+        """
+        返回缩尾后的副本 (只改 columns 中的列，其余列原样保留)。
+        浮点列保持原类型；整数列 (如 Word_Count) 的边界一般不是整数，转回整数会把下界 9.99 截成 9 (仍低于边界)，
+        因此与 Series.clip 一样升为 float64
+        """
+        if self.lower_ is None:
+            raise RuntimeError("Winsorizer 尚未 fit")
+        values = df[self.columns].to_numpy(dtype=np.float64)
+        lower = self.lower_.to_numpy(dtype=np.float64)
+        upper = self.upper_.to_numpy(dtype=np.float64)
+
+        if self.group_lower_ is not None:
+            # 边界表最后一行是全样本边界：训练时没有的分组 (或样本太少的分组) get_indexer 得到 -1，正好取到它
+            row = self.group_lower_.index.get_indexer(df[self.group_by].to_numpy())
+            lower = np.vstack([self.group_lower_.to_numpy(), lower])[row]
+            upper = np.vstack([self.group_upper_.to_numpy(), upper])[row]
+
+        result = df.copy()
+        clipped = np.clip(values, lower, upper)
+        for i, col in enumerate(self.columns):
+            if pd.api.types.is_float_dtype(df[col]):
+                result[col] = clipped[:, i].astype(df[col].dtype, copy=False)
+            else:
+                result[col] = clipped[:, i]
+        return result
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def state(self):
+        """
+        拟合结果的可序列化形式 (保存为 JSON，也用作模型缓存指纹的一部分)
+        """
+        state = {
+            'columns': self.columns,
+            'limits': list(self.limits),
+            'group_by': self.group_by,
+            'min_group_size': self.min_group_size,
+            'lower': self.lower_.tolist(),
+            'upper': self.upper_.tolist(),
+            'groups': None,
+        }
+        if self.group_lower_ is not None:
+            state['groups'] = [
+                [_to_json_value(group), self.group_lower_.loc[group].tolist(), self.group_upper_.loc[group].tolist()]
+                for group in self.group_lower_.index
+            ]
+        return state
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.state(), f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        winsorizer = cls(state['columns'], state['limits'], state['group_by'], state['min_group_size'])
+        winsorizer.lower_ = pd.Series(state['lower'], index=winsorizer.columns, dtype=np.float64)
+        winsorizer.upper_ = pd.Series(state['upper'], index=winsorizer.columns, dtype=np.float64)
+        if state['groups'] is not None:
+            index = [group for group, _, _ in state['groups']]
+            winsorizer.group_lower_ = pd.DataFrame([low for _, low, _ in state['groups']],
+                                                   index=index, columns=winsorizer.columns, dtype=np.float64)
+            winsorizer.group_upper_ = pd.DataFrame([high for _, _, high in state['groups']],
+                                                   index=index, columns=winsorizer.columns, dtype=np.float64)
+        return winsorizer
@@ -0,0 +1,175 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import BaggingRegressor, ExtraTreesRegressor, RandomForestRegressor
+from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from threadpoolctl import threadpool_limits
+
+import preprocessing
+from model_cache import fingerprint, estimator_params
+from model_zoo import MODELS, MODEL_WORKERS, make_pool
+from preprocessing import Winsorizer
+
+# =================配置区域=================
+WINDOW = 'expanding'  # 'expanding' 训练集为测试年份之前的全部年份；'rolling' 只用最近 WINDOW_YEARS 年
+WINDOW_YEARS = 3  # rolling 窗口的年数
+MIN_TRAIN_YEARS = 2  # 第一个折至少用这么多年训练
+WARM_START = True  # expanding 窗口下，随机森林等 bagging 集成逐年追加树，不从头重训 (boosting 模型始终从头训练)
+WARM_STEP = 20  # 每往后一年追加的树数
+RESULTS_FILE = 'table4_rolling_performance.csv'  # 每个模型每个测试年份的指标
+SUMMARY_FILE = 'table4_rolling_summary.csv'  # 每个模型跨年份的均值和标准差
+PREDICTIONS_FILE = 'rolling_predictions.csv'  # 每个折的逐行预测，供之后做 Diebold-Mariano 等检验
+
+
+# =========================================
+# 按年份的滚动起点样本外评估：用 ≤ t 年的数据训练，预测 t+1 年，t 逐年后移。
+# 与随机划分不同，训练集中不会混入未来年份；每个测试年份一个折，指标有均值也有标准差。
+# 没有依赖关系的折 (OLS、boosting 等、或关闭热启动时) 各自作为一个任务并行；热启动的 bagging 集成在同一个进程里
+# 按年份顺序训练：第一个折完整训练，之后每年在扩大的训练集上追加 WARM_STEP 棵树，代价约为完整重训的 WARM_STEP / n_estimators。
+# rolling 窗口会丢弃早年数据，已有的树用过窗口外的数据，因此只在 expanding 窗口下热启动。
+# 只有各棵树互相独立的 bagging 集成 (随机森林等) 可以这样追加：boosting 的新树拟合的是旧树的残差，
+# HistGradientBoosting 每次 fit 还会在新数据上重新分箱，旧树按旧的分箱阈值在新分箱上取值，残差和预测都会出错。
+WARM_START_TYPES = (RandomForestRegressor, ExtraTreesRegressor, BaggingRegressor)
+
+def year_folds(years, window=WINDOW, window_years=WINDOW_YEARS, min_train_years=MIN_TRAIN_YEARS):
+    """
+    返回 [(训练年份列表, 测试年份)]，按测试年份排序
+    """
+    years = sorted(set(int(y) for y in years))
+    folds = []
+    for i in range(min_train_years, len(years)):
+        start = 0 if window == 'expanding' else max(0, i - window_years)
+        folds.append((years[start:i], years[i]))
+    return folds
+
+
+def _size_param(model):
+    """
+    可以热启动的 bagging 集成返回控制树数的参数名 (热启动时逐步增大)；其他模型 (含 boosting) 返回 None
+    """
+    if not isinstance(model, WARM_START_TYPES):
+        return None
+    return 'n_estimators'
+
+
+def run_chain(task):
+    """
+    子进程中按顺序跑一个模型的若干个折
+    (task 为 (模型名, 折列表, 数据, 特征, 目标, 缩尾列, 缩尾分组, 线程数, 是否热启动))。
+    每个折都只在训练窗口上拟合缩尾边界。返回 (指标行列表, 预测 DataFrame 列表)
+    """
+    name, folds, data, features, target, winsor_columns, winsor_group, n_jobs, warm = task
+    rows, predictions = [], []
+    model = None
+    with threadpool_limits(limits=n_jobs):
+        for train_years, test_year in folds:
+            train = data[data['Year'].isin(train_years)]
+            test = data[data['Year'] == test_year]
+            winsorizer = Winsorizer(winsor_columns, group_by=winsor_group).fit(train)
+            train, test = winsorizer.transform(train), winsorizer.transform(test)
+
+            size_param = _size_param(model) if model is not None else None
+            if warm and size_param is not None:
+                model.set_params(**{size_param: model.get_params()[size_param] + WARM_STEP})
+                warm_started = True
+            else:
+                model = MODELS[name](n_jobs)
+                if warm and _size_param(model) is not None:
+                    model.set_params(warm_start=True)
+                warm_started = False
+
+            start = time.perf_counter()
+            model.fit(train[features], train[target])
+            fit_seconds = time.perf_counter() - start
+            y_pred = model.predict(test[features])
+
+            rows.append({
+                'Model': name,
+                'Test_Year': test_year,
+                'Train_Years': f"{train_years[0]}-{train_years[-1]}",
+                'N_Train': len(train),
+                'N_Test': len(test),
+                'R-squared': round(r2_score(test[target], y_pred), 3),
+                'RMSE': round(np.sqrt(mean_squared_error(test[target], y_pred)), 3),
+                'MAE': round(mean_absolute_error(test[target], y_pred), 3),
+                'Fit_Seconds': round(fit_seconds, 3),
+                'Warm_Start': warm_started,
+            })
+            predictions.append(pd.DataFrame({
+                'Model': name,
+                'StockCode': test['StockCode'].astype(str).values,
+                'Year': test_year,
+                'y_true': test[target].values,
+                'y_pred': y_pred,
+            }))
+    return rows, predictions
+
+
+def rolling_evaluation(data, features, target, names, winsor_columns=None, window=WINDOW,
+                       warm_start=WARM_START, workers=MODEL_WORKERS, cache=None, winsor_group=None):
+    """
+    对 names 中的每个模型做按年份的滚动起点评估，返回 (每折指标 DataFrame, 汇总 DataFrame, 逐行预测 DataFrame)。
+    winsor_group 为缩尾分组列 (与 Winsorizer 的 group_by 相同，None 为全样本)。
+    给出 cache (model_cache.ModelCache) 时，每个任务 (一个模型的一个折或一条热启动链) 的指标和预测按指纹缓存
+    """
+    winsor_columns = winsor_columns or [target] + list(features)
+    folds = year_folds(data['Year'], window)
+    if not folds:
+        raise ValueError(f"年份太少，无法划分滚动窗口 (至少需要 {MIN_TRAIN_YEARS + 1} 个年份)")
+    warm = warm_start and window == 'expanding'
+    extra = [winsor_group] if winsor_group not in (None, 'StockCode', 'Year') else []
+    data = data[['StockCode', 'Year', *dict.fromkeys([target, *features, *winsor_columns, *extra])]]
+
+    jobs = []  # (模型名, 折列表, 是否热启动)
+    for name in names:
+        if warm and _size_param(MODELS[name](1)) is not None:
+            jobs.append((name, folds, True))
+        else:
+            # 没有热启动的折互不依赖，每个折一个任务
+            jobs.extend((name, [fold], False) for fold in folds)
+    jobs.sort(key=lambda job: -len(job[1]))  # 耗时最长的热启动链先开始
+    workers = max(1, min(workers, len(jobs)))
+    n_jobs = max(1, (os.cpu_count() or 1) // workers)
+    tasks = [(name, chain, data, features, target, winsor_columns, winsor_group, n_jobs, chain_warm)
+             for name, chain, chain_warm in jobs]
+
+    keys, outputs = [None] * len(tasks), [None] * len(tasks)
+    if cache is not None:
+        winsor_params = [preprocessing.LIMITS, winsor_group, preprocessing.MIN_GROUP_SIZE]
+        for i, (name, chain, chain_warm) in enumerate(jobs):
+            keys[i] = fingerprint('rolling_eval', name, estimator_params(MODELS[name](1)), chain, chain_warm,
+                                  WARM_STEP if chain_warm else None, data, list(features), target,
+                                  list(winsor_columns), winsor_params)
+            outputs[i] = cache.load(keys[i])
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if cache is not None:
+        print(f"滚动评估缓存: 命中 {len(tasks) - len(missing)} 个任务，需要训练 {len(missing)} 个")
+
+    if missing:
+        workers = max(1, min(workers, len(missing)))
+        with make_pool(workers) as pool:
+            fitted = pool.map(run_chain, [tasks[i] for i in missing], chunksize=1)
+        for i, output in zip(missing, fitted):
+            if cache is not None:
+                cache.save(keys[i], output)
+            outputs[i] = output
+
+    folds_df = pd.DataFrame([row for rows, _ in outputs for row in rows])
+    folds_df['Model'] = pd.Categorical(folds_df['Model'], categories=list(names), ordered=True)
+    folds_df = folds_df.sort_values(['Model', 'Test_Year']).reset_index(drop=True)
+    folds_df['Model'] = folds_df['Model'].astype(str)
+
+    summary = folds_df.groupby('Model', sort=False).agg(
+        Folds=('Test_Year', 'size'),
+        R2_Mean=('R-squared', 'mean'),
+        R2_Std=('R-squared', 'std'),
+        RMSE_Mean=('RMSE', 'mean'),
+        RMSE_Std=('RMSE', 'std'),
+        MAE_Mean=('MAE', 'mean'),
+        Fit_Seconds_Total=('Fit_Seconds', 'sum'),
+    ).round(3).reset_index()
+
+    predictions = pd.concat([frame for _, frames in outputs for frame in frames], ignore_index=True)
+    return folds_df, summary, predictions
@@ -0,0 +1,106 @@
+import os
+import gzip
+import json
+
+import jieba
+
+import jieba_setup
+
+# =================配置区域=================
+CACHE_DIR = 'text_cache'  # 提取结果缓存目录
+# 提取器版本：修改页面选择规则、章节定位或清洗规则时必须改这个字符串，旧缓存随之失效
+# (实际的缓存键为 "后端名-页面策略-提取器版本"，更换 PDF 后端或页面策略会自动使用独立的缓存)
+EXTRACTOR_VERSION = 'v1'
+# 分词版本：修改分词参数时改这个字符串 (jieba 自身的版本号和 jieba_setup 的词典签名会自动计入)
+TOKENIZER_VERSION = 'jieba-v2'
+
+
+# =========================================
+
+def _cache_path(sha256, kind, version):
+    return os.path.join(CACHE_DIR, version, sha256[:2], f"{sha256}.{kind}.txt.gz")
+
+
+# 缓存文件格式：gzip 文本，第一行是 JSON 附加信息，之后每行一项 (一页文本或一个词)。
+# 清洗后的文本只含汉字，不会出现换行，因此可以逐行流式读写，内存只占一行。
+
+def _open_lines(path):
+    """
+    打开缓存文件，返回 (逐行迭代器, 附加信息字典)；不存在或损坏时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    f = gzip.open(path, 'rt', encoding='utf-8')
+    try:
+        meta = json.loads(f.readline())
+    except (OSError, ValueError, EOFError):
+        # 损坏的缓存当作不存在 (正常写入都是原子改名，不会留下写了一半的文件)
+        f.close()
+        return None
+
+    def lines():
+        with f:
+            for line in f:
+                yield line.rstrip('\n')
+
+    return lines(), meta
+
+
+def _tee_lines(path, items, meta):
+    """
+    边向下游逐项产出 items，边写入缓存；全部产出完才原子改名生效，中途中断则丢弃临时文件
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 多进程同时写同一目录：先写带进程号的临时文件，再原子改名
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    complete = False
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(json.dumps(meta or {}, ensure_ascii=False) + '\n')
+            for item in items:
+                f.write(item + '\n')
+                yield item
+        os.replace(tmp_path, path)
+        complete = True
+    finally:
+        if not complete and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def extractor_key(backend, page_strategy):
+    """
+    缓存键中的提取器部分：后端名 + 页面策略 + 提取器版本
+    """
+    return f"{backend}-{page_strategy}-{EXTRACTOR_VERSION}"
+
+
+def tokenizer_version():
+    return f"{TOKENIZER_VERSION}-jieba{jieba.__version__}-{jieba_setup.dictionary_signature()}"
+
+
+def open_pages(sha256, version):
+    """
+    读取缓存的逐页清洗文本，返回 (逐页文本迭代器, 附加信息字典)；未命中返回 None
+    """
+    return _open_lines(_cache_path(sha256, 'pages', version))
+
+
+def tee_pages(sha256, pages, version, meta=None):
+    """
+    包装逐页文本迭代器：下游读完最后一页时缓存写入完成
+    """
+    return _tee_lines(_cache_path(sha256, 'pages', version), pages, meta)
+
+
+def open_tokens(sha256, version):
+    """
+    读取缓存的 jieba 分词结果，返回 (词迭代器, 附加信息字典)；提取器或分词器任一变化都会失效
+    """
+    return _open_lines(_cache_path(sha256, 'tokens', f"{version}/{tokenizer_version()}"))
+
+
+def tee_tokens(sha256, tokens, version, meta=None):
+    """
+    包装词迭代器：下游读完最后一个词时缓存写入完成
+    """
+    return _tee_lines(_cache_path(sha256, 'tokens', f"{version}/{tokenizer_version()}"), tokens, meta)
@@ -0,0 +1,140 @@
+import re
+import sqlite3
+import json
+from datetime import datetime
+
+import pandas as pd
+
+# =================配置区域=================
+TONE_DB = 'tone_results.sqlite'  # 语调结果库文件
+
+
+# =========================================
+# 结果状态：ok 有语调结果 / empty 文本太少 (确定性的结果，同样内容不再重复解析) / error 解析时出现异常 (下次运行重试)
+
+def publish_date(file_name):
+    """
+    文件名 (000001_2023-04-20.pdf) 中的发布日期 'YYYY-MM-DD'，没有时返回 None。
+    写入 tone_results.csv 的 PublishDate 列：同一公司-年份有修订版时，panel_join 按它保留最新的一份
+    """
+    match = re.search(r'\d{4}-\d{2}-\d{2}', file_name or '')
+    return match.group(0) if match else None
+
+
+class ToneStore:
+    """
+    语调结果库 (SQLite)：每解析完一份年报立即写入一行并提交，进程中途被杀也只丢失正在解析的那一份。
+    主键为 (股票代码, 年份, 内容哈希, 词典版本)；词典版本由调用方给出 (见 extract_tone.scoring_version)，
+    改词典、分词器或提取规则后版本变化，旧结果保留在库里但不再被复用。
+    文本太少的文件记为 empty，同样内容的文件之后不再重复解析；解析时出现异常 (I/O 错误、进程被杀、
+    pdfplumber 异常等) 的文件记为 error 并保存原因，不算作已有结果，下次运行重新解析，成功后覆盖这一行。
+    """
+
+    def __init__(self, db_path=TONE_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        # WAL 模式下每次提交只追加日志，逐条提交的开销很小
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tone_results (
+                stock_code TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                lexicon_version TEXT NOT NULL,
+                file_name TEXT,
+                result_json TEXT,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                PRIMARY KEY (stock_code, year, sha256, lexicon_version)
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tone_sha ON tone_results (sha256, lexicon_version)"
+        )
+        self.conn.commit()
+
+    def scored(self, lexicon_version):
+        """
+        返回该版本下已有确定结果的 {sha256: 语调结果字典或 None (文本太少)}；解析异常的文件不在其中
+        """
+        rows = self.conn.execute(
+            "SELECT sha256, result_json FROM tone_results WHERE lexicon_version = ? AND status IN ('ok', 'empty')",
+            (lexicon_version,)
+        )
+        return {sha256: json.loads(result) if result else None for sha256, result in rows}
+
+    def scored_keys(self, lexicon_version):
+        """
+        返回该版本下已有确定结果的 {(股票代码, 年份, sha256)}
+        """
+        rows = self.conn.execute(
+            "SELECT stock_code, year, sha256 FROM tone_results WHERE lexicon_version = ? AND status IN ('ok', 'empty')",
+            (lexicon_version,)
+        )
+        return set(rows)
+
+    def scored_files(self, lexicon_version):
+        """
+        返回该版本下已有确定结果的 {文件名: sha256}，用于在下载前跳过已处理过的文件
+        """
+        rows = self.conn.execute(
+            "SELECT file_name, sha256 FROM tone_results "
+            "WHERE lexicon_version = ? AND file_name IS NOT NULL AND status IN ('ok', 'empty')",
+            (lexicon_version,)
+        )
+        return dict(rows)
+
+    def save(self, rows, lexicon_version, tone_data, error=None):
+        """
+        写入同一内容 (sha256) 对应的一个或多个文件的结果并立即提交。
+        rows 为 [(文件名, 股票代码, 年份, sha256)]；error 为异常原因时记为 error。
+        已有确定结果的主键保持不变 (只追加)，之前记为 error 的行被这次的结果覆盖
+        """
+        result_json = json.dumps(tone_data, ensure_ascii=False) if tone_data else None
+        status = 'error' if error is not None else ('ok' if tone_data else 'empty')
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.executemany(
+            "INSERT INTO tone_results "
+            "(stock_code, year, sha256, lexicon_version, file_name, result_json, created_at, status, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (stock_code, year, sha256, lexicon_version) DO UPDATE SET "
+            "file_name = excluded.file_name, result_json = excluded.result_json, created_at = excluded.created_at, "
+            "status = excluded.status, error = excluded.error "
+            "WHERE tone_results.status = 'error'",
+            [(stock_code, year, sha256, lexicon_version, file_name, result_json, now, status, error)
+             for file_name, stock_code, year, sha256 in rows]
+        )
+        self.conn.commit()
+
+    def load_results(self, lexicon_version, keys=None):
+        """
+        读取该版本的有效结果，返回与 tone_results.csv 相同结构的 DataFrame (按代码、年份和发布日期排序)。
+        keys 为 {(股票代码, 年份, sha256)} 时只导出这些文件 (例如当前 PDF 文件夹中的文件)
+        """
+        rows = []
+        for stock_code, year, sha256, file_name, result in self.conn.execute(
+                "SELECT stock_code, year, sha256, file_name, result_json FROM tone_results "
+                "WHERE lexicon_version = ? AND status = 'ok' "
+                "ORDER BY stock_code, year, file_name", (lexicon_version,)):
+            if keys is not None and (stock_code, year, sha256) not in keys:
+                continue
+            rows.append({'StockCode': stock_code, 'Year': year, 'PublishDate': publish_date(file_name),
+                         **json.loads(result)})
+        df = pd.DataFrame(rows)
+        if not df.empty:
+            df.sort_values(by=['StockCode', 'Year', 'PublishDate'], inplace=True)
+        return df
+
+    def export_csv(self, path, lexicon_version, keys=None):
+        """
+        导出 CSV，返回导出的行数
+        """
+        df = self.load_results(lexicon_version, keys)
+        if not df.empty:
+            df.to_csv(path, index=False, encoding='utf-8-sig')
+        return len(df)
+
+    def close(self):
+        self.conn.close()
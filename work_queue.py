@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from tone_store import publish_date
+
+# =================配置区域=================
+# 任务表必须放在所有节点都能访问的位置 (例如与 pdf_reports/ 同一个 NFS 挂载点)。
+# SQLite 依赖文件锁，NFS 需开启锁服务 (NFSv4 或 lockd)；这里不用 WAL 模式 (WAL 的共享内存不能跨机器)
+QUEUE_DB = 'work_queue.sqlite'
+LEASE_SECONDS = 600  # 租约时长：节点崩溃后，它领取的文件最多这么久之后被其他节点重新领取
+BATCH_SIZE = 16  # 每次领取的文件数；太小时频繁抢锁，太大时最后几批在节点间分配不均
+MAX_ATTEMPTS = 3  # 同一文件领取这么多次仍未成功 (节点崩溃或解析异常) 后不再领取，标记为 failed
+BUSY_TIMEOUT = 60  # 等待其他节点释放数据库锁的秒数
+
+
+# =========================================
+# 多节点协作的任务队列：由一个规划节点列出 PDF 文件夹、去重后写入任务表 (已有的任务保持原状，
+# 之后新下载的文件再规划一次即可加入)，各 worker 节点反复 "领取一批 -> 解析 -> 逐份提交"。领取在一个 IMMEDIATE 事务里完成，
+# 同一时刻只有一个节点能改写任务表，因此一份文件不会同时租给两个节点；
+# 节点定期续租，崩溃的节点不再续租，租约到期后其文件回到可领取状态。
+# 任务状态：pending 待领取 / leased 已租出 / done 已完成 (结果为空表示文本太少) /
+# error 解析时出现异常 (下次规划时重新变为 pending) / failed 领取 MAX_ATTEMPTS 次仍未成功，不再重试
+
+def default_worker_id():
+    """
+    节点标识：主机名 + 进程号
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    任务表 (SQLite)：jobs 以 (词典版本, sha256) 为主键，一份内容一个任务；
+    job_files 记录每个文件对应的代码、年份和 sha256，用于在任意节点上导出完整的结果 CSV
+    """
+
+    def __init__(self, db_path=QUEUE_DB):
+        self.db_path = db_path
+        # isolation_level=None：事务由下面的 BEGIN IMMEDIATE / COMMIT 显式控制
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                lexicon_version TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result_json TEXT,
+                seconds REAL,
+                updated_at TEXT,
+                error TEXT,
+                PRIMARY KEY (lexicon_version, sha256)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_files (
+                lexicon_version TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (lexicon_version, file_name)
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (lexicon_version, status)"
+        )
+
+    def enqueue(self, lexicon_version, entries, to_analyze, known=None):
+        """
+        写入任务：entries 为 [(文件名, 代码, 年份, sha256)]，to_analyze 为 {sha256: 文件路径}。
+        已存在的任务保持原状 (以 (词典版本, sha256) 为键)，多个节点同时写入也不会重复；上次解析异常的任务重新变为待领取，
+        已领取 MAX_ATTEMPTS 次的记为 failed (多半是每次都会出错的文件，不再无限重试)。
+        known 为 {sha256: 语调结果或 None}：结果库中已有确定结果的内容直接记为 done，不再解析。
+        返回新写入的待解析任务数
+        """
+        known = known or {}
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "worker = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE lexicon_version = ? AND status = 'error'", (MAX_ATTEMPTS, now, lexicon_version)
+            )
+            self.conn.executemany(
+                "INSERT INTO jobs (lexicon_version, sha256, file_name, status, result_json, updated_at) "
+                "VALUES (?, ?, ?, 'done', ?, ?) "
+                "ON CONFLICT (lexicon_version, sha256) DO UPDATE SET status = 'done', worker = NULL, "
+                "lease_expires = NULL, result_json = excluded.result_json, updated_at = excluded.updated_at "
+                "WHERE jobs.status = 'pending'",
+                [(lexicon_version, sha256, os.path.basename(path),
+                  json.dumps(known[sha256], ensure_ascii=False) if known[sha256] else None, now)
+                 for sha256, path in to_analyze.items() if sha256 in known]
+            )
+            added = self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (lexicon_version, sha256, file_name, updated_at) VALUES (?, ?, ?, ?)",
+                [(lexicon_version, sha256, os.path.basename(path), now)
+                 for sha256, path in to_analyze.items() if sha256 not in known]
+            ).rowcount
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO job_files (lexicon_version, file_name, stock_code, year, sha256) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(lexicon_version, *entry) for entry in entries]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, worker, lexicon_version, limit=BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+        """
+        领取最多 limit 个待处理任务 (含租约已过期的)，返回 [(sha256, 文件名)]；没有可领取的任务时返回 []
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 租约过期次数已达上限的任务不再重试 (多半是让解析进程崩溃的文件)
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', worker = NULL, updated_at = ? "
+                "WHERE lexicon_version = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), lexicon_version, now, MAX_ATTEMPTS)
+            )
+            rows = self.conn.execute(
+                "SELECT sha256, file_name FROM jobs WHERE lexicon_version = ? "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY file_name LIMIT ?",
+                (lexicon_version, now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE lexicon_version = ? AND sha256 = ?",
+                [(worker, now + lease_seconds, lexicon_version, sha256) for sha256, _ in rows]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def renew(self, worker, lexicon_version, shas, lease_seconds=LEASE_SECONDS):
+        """
+        续租本节点仍在处理的任务；返回续租成功的个数 (租约已过期并被其他节点领走的不会续上)
+        """
+        expires = time.time() + lease_seconds
+        cursor = self.conn.executemany(
+            "UPDATE jobs SET lease_expires = ? "
+            "WHERE lexicon_version = ? AND sha256 = ? AND worker = ? AND status = 'leased'",
+            [(expires, lexicon_version, sha256, worker) for sha256 in shas]
+        )
+        return cursor.rowcount
+
+    def complete(self, worker, lexicon_version, sha256, tone_data, seconds=None, error=None):
+        """
+        提交一份结果 (tone_data 为 None 表示文本太少；error 为异常原因时记为 error，下次规划时重试，
+        已领取 MAX_ATTEMPTS 次的直接记为 failed)。先提交者为准：任务已被其他节点完成时不覆盖，返回 False
+        """
+        status = 'error' if error is not None else 'done'
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN ? = 'error' AND attempts >= ? THEN 'failed' ELSE ? END, "
+            "worker = ?, lease_expires = NULL, result_json = ?, error = ?, seconds = ?, updated_at = ? "
+            "WHERE lexicon_version = ? AND sha256 = ? AND status != 'done'",
+            (status, MAX_ATTEMPTS, status, worker,
+             json.dumps(tone_data, ensure_ascii=False) if tone_data else None, error, seconds,
+             datetime.now().strftime("%Y-%m-%d %H:%M:%S"), lexicon_version, sha256)
+        )
+        return cursor.rowcount > 0
+
+    def progress(self, lexicon_version):
+        """
+        返回各状态的任务数 {'pending': n, 'leased': n, 'done': n, 'error': n, 'failed': n}
+        """
+        counts = dict.fromkeys(['pending', 'leased', 'done', 'error', 'failed'], 0)
+        counts.update(self.conn.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE lexicon_version = ? GROUP BY status", (lexicon_version,)
+        ))
+        return counts
+
+    def load_results(self, lexicon_version):
+        """
+        读取已完成的有效结果，返回与 tone_results.csv 相同结构的 DataFrame (按代码、年份和发布日期排序)
+        """
+        rows = []
+        for stock_code, year, file_name, result in self.conn.execute(
+                "SELECT f.stock_code, f.year, f.file_name, j.result_json FROM job_files f "
+                "JOIN jobs j ON j.lexicon_version = f.lexicon_version AND j.sha256 = f.sha256 "
+                "WHERE f.lexicon_version = ? AND j.status = 'done' AND j.result_json IS NOT NULL "
+                "ORDER BY f.stock_code, f.year, f.file_name", (lexicon_version,)):
+            rows.append({'StockCode': stock_code, 'Year': year, 'PublishDate': publish_date(file_name),
+                         **json.loads(result)})
+        df = pd.DataFrame(rows)
+        if not df.empty:
+            df.sort_values(by=['StockCode', 'Year', 'PublishDate'], inplace=True)
+        return df
+
+    def close(self):
+        self.conn.close()